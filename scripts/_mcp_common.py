@@ -0,0 +1,144 @@
+"""
+Transport-neutral helpers shared by the MCP test scripts
+
+JSON encoding, newline-delimited line splitting and the server build and spawn
+steps. Only the standard library (plus orjson, when installed) is needed, so the
+STDIO test can use them without pulling in an HTTP client.
+"""
+
+import json
+import logging
+import os
+import subprocess
+import sys
+from typing import List
+
+try:
+    import orjson
+    dumps = orjson.dumps
+    loads = orjson.loads
+    
+    def pretty_json(obj) -> str:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode()
+except ImportError:
+    def dumps(obj) -> bytes:
+        return json.dumps(obj, separators=(',', ':')).encode()
+    loads = json.loads
+    
+    def pretty_json(obj) -> str:
+        return json.dumps(obj, indent=2)
+
+def configure_logging(verbose: bool = False):
+    """Print log records to stdout, in order with the scripts' own output.
+    
+    verbose turns on the per-message traces, which all log under "mcp_test_client",
+    without also turning on urllib3's.
+    """
+    logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stdout)
+    if verbose:
+        logging.getLogger("mcp_test_client").setLevel(logging.DEBUG)
+
+# Logged on stderr once the server is up and its transport is running. Scripts wait
+# for it rather than sleeping; requests written earlier would only queue in the stdin
+# pipe, so a missing line is worth a warning but isn't fatal
+READY_MARKER = b"MCP server started"
+
+# A line longer than this means the peer isn't speaking a line protocol; stop buffering it
+MAX_LINE = 8 << 20
+
+class LineBuffer:
+    """Split raw bytes into lines as chunks arrive.
+    
+    Lines are located with bytes.find against a read cursor, so nothing is decoded
+    and consumed bytes are only compacted away once more than 4 KiB pile up.
+    """
+    
+    def __init__(self):
+        self._buffer = bytearray()
+        self._pos = 0
+    
+    def feed(self, chunk: bytes) -> List[bytes]:
+        """Return every line completed by chunk, without its line ending.
+        
+        Blank lines come back as b'', since SSE ends each event with one. A partial
+        line stays buffered for the next chunk.
+        """
+        buffer = self._buffer
+        buffer += chunk
+        pos = self._pos
+        lines = []
+        while True:
+            nl = buffer.find(b'\n', pos)
+            if nl < 0:
+                break
+            end = nl - 1 if nl > pos and buffer[nl - 1] == 13 else nl  # Drop a CRLF's CR
+            lines.append(bytes(buffer[pos:end]))
+            pos = nl + 1
+        if pos == len(buffer):
+            buffer.clear()
+            pos = 0
+        elif pos > 4096:
+            del buffer[:pos]
+            pos = 0
+        self._pos = pos
+        if len(buffer) - pos > MAX_LINE:
+            raise ValueError(f"Line exceeds {MAX_LINE} bytes without a newline")
+        return lines
+
+def server_binary_is_current(binary: str = "./mcp-server", sources=("cmd", "pkg", "go.mod", "go.sum")) -> bool:
+    """True when binary exists and is newer than every Go source it is built from.
+    
+    Lets a script skip `make build`, which still forks make and the go toolchain
+    when there is nothing to rebuild.
+    """
+    try:
+        built = os.path.getmtime(binary)
+    except OSError:
+        return False
+    for source in sources:
+        if os.path.isfile(source):
+            if os.path.getmtime(source) > built:
+                return False
+            continue
+        for root, _, files in os.walk(source):
+            for name in files:
+                if name.endswith(".go") and os.path.getmtime(os.path.join(root, name)) > built:
+                    return False
+    return True
+
+def build_server(timeout: float = 30) -> bool:
+    """Run `make build` with its output going straight to our stderr; True if it succeeded.
+    
+    Nothing is captured, so the build log shows up as make writes it, survives a
+    failure or a timeout, and is never held in memory.
+    """
+    sys.stdout.flush()  # Keep our own progress lines ahead of make's
+    process = subprocess.Popen(['make', 'build'], stdout=sys.stderr, stderr=sys.stderr)
+    try:
+        returncode = process.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+        print(f"❌ Build timed out after {timeout}s")
+        return False
+    if returncode != 0:
+        print(f"❌ Build failed: make exited with status {returncode}")
+        return False
+    return True
+
+def ensure_server_built(binary: str = "./mcp-server", timeout: float = 30) -> bool:
+    """Build the server, unless binary is already newer than its sources; True once it is current"""
+    if server_binary_is_current(binary):
+        print("✓ Server binary is up to date, skipping build")
+        return True
+    print("🔨 Building MCP server...")
+    if not build_server(timeout=timeout):
+        return False
+    print("✓ Build successful")
+    return True
+
+def spawn_server(command, **popen_kwargs) -> subprocess.Popen:
+    """Start the server with command; popen_kwargs go straight to Popen"""
+    # close_fds=False lets CPython spawn with posix_spawn() rather than fork+exec;
+    # our own descriptors are all non-inheritable (PEP 446), so nothing leaks
+    return subprocess.Popen(command, close_fds=False, **popen_kwargs)
@@ -0,0 +1,384 @@
+"""
+Shared HTTP Streams client for the MCP test scripts
+
+HTTPStreamsClient is the threaded requests-based client. The SSE helpers are shared
+with the other HTTP integration scripts; transport-neutral ones live in _mcp_common.
+"""
+
+import json
+import logging
+import requests
+import socket
+import threading
+from requests.adapters import HTTPAdapter
+from typing import Dict, Any, List, Optional, Tuple
+from urllib3.util.retry import Retry
+
+from _mcp_common import LineBuffer, dumps, loads, pretty_json
+
+# Per-event tracing; only formatted when DEBUG is enabled
+logger = logging.getLogger("mcp_test_client")
+
+# Stream reads are this size, so a burst of events costs one recv() rather than many
+_READ_SIZE = 65536
+
+# Statuses that acknowledge a message without a body; its response (if any) is on the stream
+_ACCEPTED = (202, 204)
+
+# Notifications get no reply, so don't let a hung server hold one for long: (connect, read)
+_NOTIFY_TIMEOUT = (2, 5)
+
+# Protocol literals, kept in one place
+SESSION_HEADER = 'Mcp-Session-Id'
+JSONRPC_CONTENT_TYPE = 'application/json'
+SSE_ACCEPT = 'text/event-stream'
+
+class SSEEvents:
+    """Assemble SSE lines into (event, data) pairs.
+    
+    data lines build up, joined by newlines, until the blank line that ends the
+    event; comments and fields other than event and data are skipped.
+    """
+    
+    def __init__(self):
+        self._event = None
+        self._data = []
+    
+    def feed(self, line: bytes) -> Optional[Tuple[Optional[bytes], bytes]]:
+        """Take one line from LineBuffer; return (event name or None, data) once it ends an event"""
+        if not line:
+            event = (self._event, b'\n'.join(self._data)) if self._data else None
+            self._event = None
+            self._data = []
+            return event
+        field, _, value = line.partition(b':')
+        if value[:1] == b' ':
+            value = value[1:]
+        if field == b'data':
+            self._data.append(value)
+        elif field == b'event':
+            self._event = value
+        return None
+
+def _iter_sse_events(response, chunk_size=_READ_SIZE):
+    """Yield (event, data) for each SSE event of a streamed requests response as it arrives.
+    
+    iter_content() rather than raw.read(): urllib3's read(n) blocks until n bytes
+    arrive, while its chunked reader hands over each HTTP chunk as soon as it lands.
+    Both decode any Content-Encoding.
+    """
+    lines = LineBuffer()
+    events = SSEEvents()
+    for chunk in response.iter_content(chunk_size=chunk_size):
+        for line in lines.feed(chunk):
+            event = events.feed(line)
+            if event is not None:
+                yield event
+
+def _parse_sse_data(data: bytes) -> Optional[Dict]:
+    """Log one SSE event's data and return the JSON-RPC message it carries, if it has an ID"""
+    debug = logger.isEnabledFor(logging.DEBUG)
+    if debug:
+        logger.debug("SSE data received: %r", data)
+    
+    try:
+        message = loads(data)
+    except json.JSONDecodeError as e:
+        print(f"Failed to parse JSON: {e}")
+        return None
+    if isinstance(message, dict) and 'id' in message:
+        if debug:
+            logger.debug("← SSE Response: %s", pretty_json(message))
+        return message
+    return None
+
+def _response_socket(raw):
+    """The socket under a urllib3 response, or None once it has been released"""
+    sock = getattr(getattr(raw, 'connection', None), 'sock', None)
+    if sock is None:
+        # Older urllib3 doesn't expose the connection; reach the socket through http.client
+        try:
+            sock = raw._fp.fp.raw._sock
+        except AttributeError:
+            pass  # Already released
+    return sock
+
+def _close_stream(response):
+    """Close a streamed response, waking any thread blocked reading it.
+    
+    requests' close() alone doesn't interrupt a recv() in progress on Linux, so the
+    socket is shut down first and the reader sees EOF at once.
+    """
+    sock = _response_socket(response.raw)
+    if sock is not None:
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass  # Already closed by the server
+    response.close()
+
+class EventStream:
+    """A streamed SSE response that can be read under a selector.
+    
+    urllib3 sends the request and http.client undoes the body framing, so read()
+    only needs read1(). http.client reads the socket through a buffer, though, and
+    bytes it has already pulled in don't wake a selector; read() therefore keeps
+    going until nothing more can be had without waiting.
+    """
+    
+    def __init__(self, response):
+        """response is a urllib3 HTTPResponse opened with preload_content=False"""
+        self.response = response
+        self.status = response.status
+        self.body = bytearray()
+        self.sock = _response_socket(response)
+        self._timeout = self.sock.gettimeout()
+    
+    def fileno(self) -> int:
+        return self.sock.fileno()
+    
+    def _available(self) -> bool:
+        """True if read1() can make progress right now: buffered body, fresh socket data or EOF"""
+        http_response = self.response._fp
+        if http_response.fp is None:
+            return True  # http.client has seen the end; read1() reports it
+        self.sock.setblocking(False)
+        try:
+            # With the socket non-blocking, peek() returns the buffer or whatever has arrived, never waiting
+            pending = http_response.fp.peek(1)
+            # A chunk's closing CRLF alone isn't body: read1() would take it, then wait for the next chunk
+            if pending and not (http_response.chunked and not http_response.chunk_left and pending == b'\r\n'):
+                return True
+            try:
+                self.sock.recv(1, socket.MSG_PEEK)
+                return True  # More data, or EOF for read1() to report
+            except BlockingIOError:
+                return False
+        finally:
+            self.sock.settimeout(self._timeout)
+    
+    def read(self) -> bool:
+        """Move whatever has arrived into body without waiting for more; False once the stream has ended"""
+        while self._available():
+            data = self.response.read1(_READ_SIZE)
+            if not data:
+                return False
+            self.body += data
+        return True
+    
+    def close(self):
+        """Drop the stream at once; shutdown() sends the FIN even if another fd still shares the socket"""
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass  # Server already closed it
+        self.response.close()
+
+def new_session() -> requests.Session:
+    """A requests session sized for one held SSE stream plus the POSTs.
+    
+    The pool has two slots: the stream keeps one for its lifetime and every POST
+    reuses the other. Connection failures and 502/503/504 are retried twice with a
+    short backoff; anything else surfaces at once.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=2,
+        max_retries=Retry(total=2, backoff_factor=0.1, status_forcelist=[502, 503, 504])
+    )
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+def _rpc_message(method: str, params: Any = None, request_id: Any = None) -> Dict:
+    """Build a JSON-RPC request, or a notification when request_id is None"""
+    if request_id is None:
+        if params is None:
+            return {"jsonrpc": "2.0", "method": method}
+        return {"jsonrpc": "2.0", "method": method, "params": params}
+    if params is None:
+        return {"jsonrpc": "2.0", "method": method, "id": request_id}
+    return {"jsonrpc": "2.0", "method": method, "id": request_id, "params": params}
+
+class _SessionHeaders:
+    """URLs and headers built once; setting session_id adds or drops Mcp-Session-Id in place"""
+    
+    def _init_headers(self, base_url: str, stream_path: str, message_path: str):
+        self.base_url = base_url
+        self.stream_url = f"{base_url}{stream_path}"
+        self.message_url = f"{base_url}{message_path}"
+        self._post_headers = {
+            'Content-Type': JSONRPC_CONTENT_TYPE,
+            'Accept': f'{JSONRPC_CONTENT_TYPE}, {SSE_ACCEPT}'
+        }
+        self._stream_headers = {
+            'Accept': SSE_ACCEPT,
+            'Cache-Control': 'no-cache'
+        }
+        self.session_id = None
+    
+    @property
+    def session_id(self):
+        return self._session_id
+    
+    @session_id.setter
+    def session_id(self, session_id):
+        """Keep the cached POST and stream headers in step with the session"""
+        self._session_id = session_id
+        for headers in (self._post_headers, self._stream_headers):
+            if session_id:
+                headers[SESSION_HEADER] = session_id
+            else:
+                headers.pop(SESSION_HEADER, None)
+    
+    def _note_session(self, headers):
+        """Pick up the session ID a POST response assigns"""
+        session_id = headers.get(SESSION_HEADER)
+        if session_id:
+            self.session_id = session_id
+            print(f"📝 Session ID: {self.session_id}")
+
+class HTTPStreamsClient(_SessionHeaders):
+    """Client for the HTTP Streams transport.
+    
+    Messages are POSTed to message_path. A response comes back either directly in
+    the POST reply (initialize) or on the SSE stream opened at stream_path, where a
+    reader thread hands it to the sender waiting on its ID.
+    """
+    
+    def __init__(self, base_url: str = "http://localhost:8080", stream_path: str = "/mcp", message_path: str = "/mcp"):
+        self.session = new_session()
+        self.session.headers.update({'Connection': 'keep-alive'})
+        self._init_headers(base_url, stream_path, message_path)
+        self.stream_response = None
+        self.stream_thread = None
+        # request id -> (Event, result slot); the stream thread fills the slot and sets the Event
+        self._pending: Dict[Any, Tuple[threading.Event, List[Dict]]] = {}
+        self._pending_lock = threading.Lock()
+        self.running = False
+    
+    def start_stream(self) -> bool:
+        """Start the SSE stream for receiving responses"""
+        try:
+            response = self.session.get(
+                self.stream_url,
+                headers=self._stream_headers,
+                stream=True,
+                timeout=None  # No timeout for SSE stream
+            )
+            
+            if response.status_code == 200:
+                self.stream_response = response
+                self.running = True
+                self.stream_thread = threading.Thread(target=self._read_stream)
+                self.stream_thread.daemon = True
+                self.stream_thread.start()
+                
+                # The server registers the session before its first flush, so a 200 means
+                # ready; anything sent before the reader gets going waits in the socket
+                print(f"✓ SSE stream established for session {self.session_id}")
+                return True
+            else:
+                print(f"❌ SSE stream failed with status {response.status_code}")
+                response.close()
+                return False
+        
+        except Exception as e:
+            print(f"Error starting SSE stream: {e}")
+            return False
+    
+    def _read_stream(self):
+        """Read SSE events from the stream"""
+        try:
+            for _, data in _iter_sse_events(self.stream_response):
+                if not self.running:
+                    break
+                
+                message = _parse_sse_data(data)
+                if message is not None:
+                    # Hand the response to the sender waiting on its ID
+                    with self._pending_lock:
+                        pending = self._pending.get(message['id'])
+                    if pending:
+                        pending[1].append(message)
+                        pending[0].set()
+        
+        except Exception as e:
+            if self.running:  # close() ends the stream on purpose
+                print(f"SSE stream error: {e}")
+        finally:
+            self.running = False
+    
+    def send_request(self, method: str, params: Any = None, request_id: Any = 1) -> Optional[Dict]:
+        """Send a JSON-RPC request and return its response"""
+        return self.send_message(_rpc_message(method, params, request_id))
+    
+    def send_notification(self, method: str, params: Any = None) -> bool:
+        """Send a JSON-RPC notification (no response expected)"""
+        return self.send_message(_rpc_message(method, params)) is not None
+    
+    def send_message(self, message: Dict, wait_for_response: bool = True) -> Optional[Dict]:
+        """POST a message and return its response.
+        
+        Returns the POST's own JSON body when there is one, otherwise waits up to 5s
+        for the response on the stream. Accepted notifications return {"status": "ok"}.
+        """
+        # Register before POSTing so a response that beats the POST reply isn't missed
+        pending = None
+        request_id = message.get('id')
+        if wait_for_response and request_id is not None:
+            pending = (threading.Event(), [])
+            with self._pending_lock:
+                self._pending[request_id] = pending
+        
+        try:
+            if request_id is None:
+                # Notification: only the status matters, so never look at the body
+                response = self.session.post(
+                    self.message_url,
+                    data=dumps(message),
+                    headers=self._post_headers,
+                    timeout=_NOTIFY_TIMEOUT
+                )
+                return {"status": "ok"} if response.status_code in (200, *_ACCEPTED) else None
+            
+            response = self.session.post(
+                self.message_url,
+                data=dumps(message),
+                headers=self._post_headers,
+                timeout=10
+            )
+            if response.status_code >= 400:
+                print(f"❌ POST failed with status {response.status_code}")
+                return None
+            self._note_session(response.headers)
+            
+            # Some replies (initialize) come back directly rather than on the stream
+            if response.status_code not in _ACCEPTED and response.headers.get('Content-Length') != '0':
+                return loads(response.content)
+            
+            if pending:
+                event, slot = pending
+                if event.wait(timeout=5.0):
+                    return slot[0]
+                print(f"❌ Timeout waiting for response with ID {request_id}")
+                return None
+            
+            return {"status": "ok"}
+        except Exception as e:
+            print(f"Error sending message: {e}")
+            return None
+        finally:
+            if pending:
+                with self._pending_lock:
+                    self._pending.pop(request_id, None)
+    
+    def close(self):
+        """Close the client connection"""
+        self.running = False
+        if self.stream_response:
+            _close_stream(self.stream_response)
+        if self.stream_thread and self.stream_thread.is_alive():
+            self.stream_thread.join(timeout=1)
+        self.session.close()
@@ -5,22 +5,389 @@ Tests STDIO, SSE, and HTTP Streams transports
 """
 
 import json
+import logging
+import logging.handlers
+import os
+import queue
 import requests
+import selectors
 import subprocess
 import threading
 import time
 import sys
+import urllib3
 import argparse
+from functools import lru_cache
 from typing import Dict, Any, Optional, List
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
-class STDIOClient:
+from _mcp_common import READY_MARKER, LineBuffer, dumps, loads
+from _mcp_test_client import (
+    JSONRPC_CONTENT_TYPE,
+    SESSION_HEADER,
+    SSE_ACCEPT,
+    EventStream,
+    SSEEvents,
+    new_session,
+)
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # Not available on Windows
+
+
+logger = logging.getLogger("mcp.test")
+
+
+def _start_log_listener() -> logging.handlers.QueueListener:
+    """Route logger through a queue drained by one listener thread.
+    
+    Test threads and the demux thread only enqueue records; formatting and the
+    stdout write (and its lock) all happen on the listener.
+    """
+    log_queue = queue.SimpleQueue()
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    listener = logging.handlers.QueueListener(log_queue, handler)
+    listener.start()
+    return listener
+
+
+_PIPE_SIZE = 1 << 20
+
+
+def _grow_pipe(pipe):
+    """Raise a pipe's kernel buffer to _PIPE_SIZE on Linux (default is 64 KiB)"""
+    if fcntl is None or pipe is None:
+        return
+    try:
+        fcntl.fcntl(pipe.fileno(), getattr(fcntl, 'F_SETPIPE_SZ', 1031), _PIPE_SIZE)
+    except OSError:
+        pass  # Capped by /proc/sys/fs/pipe-max-size; keep the default
+
+
+def _write_line(pipe, message: bytes):
+    """Write message and its newline delimiter to a raw pipe without joining them.
+    
+    os.writev gathers both buffers in one syscall, and no flush is needed since
+    it bypasses the file object's buffer. A short write (only possible for frames
+    larger than the free pipe space) is finished with plain writes.
+    """
+    fd = pipe.fileno()
+    written = os.writev(fd, (message, b"\n"))
+    if written <= len(message):
+        rest = memoryview(message)[written:]
+        while rest:
+            rest = rest[os.write(fd, rest):]
+        os.write(fd, b"\n")
+
+
+_JSON_HEADERS = {'Content-Type': JSONRPC_CONTENT_TYPE}
+
+
+@lru_cache(maxsize=None)
+def _frame_prefix(method: str) -> bytes:
+    """The constant '{"jsonrpc":"2.0","method":...' head of a frame, built once per method"""
+    return b'{"jsonrpc":"2.0","method":' + dumps(method)
+
+
+def _encode_message(method: str, params: Any = None, request_id: Any = None) -> bytes:
+    """Serialize a JSON-RPC request (or a notification when request_id is None) to bytes"""
+    frame = _frame_prefix(method)
+    if _is_slot_id(request_id):
+        frame += _SLOT_ID_FRAGMENTS[request_id]
+    elif request_id is not None:
+        frame += b',"id":' + dumps(request_id)
+    if params is not None:
+        frame += b',"params":' + dumps(params)
+    return frame + b'}'
+
+
+class _Demux:
+    """One selector and one daemon thread that read for every threaded client.
+    
+    Clients register a readable file object with themselves as the key data; the
+    thread calls client._on_readable() each time it is readable and drops the
+    registration once that returns False.
+    """
+    
+    def __init__(self):
+        self._selector = selectors.DefaultSelector()
+        self._lock = threading.Lock()
+        self._thread = None
+    
+    def register(self, fileobj, client):
+        with self._lock:
+            self._selector.register(fileobj, selectors.EVENT_READ, client)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="mcp-demux", daemon=True)
+                self._thread.start()
+    
+    def unregister(self, fileobj):
+        with self._lock:
+            try:
+                self._selector.unregister(fileobj)
+            except (KeyError, ValueError):
+                pass  # Already dropped by the demux thread
+    
+    def _run(self):
+        while True:
+            for key, _ in self._selector.select():
+                with self._lock:
+                    if self._selector.get_map().get(key.fd) is not key:
+                        continue  # Unregistered while we were in select()
+                    try:
+                        keep = key.data._on_readable()
+                    except Exception as e:
+                        logger.error(f"Error reading {key.data.transport_name} stream: {e}")
+                        keep = False
+                    if not keep:
+                        self._selector.unregister(key.fileobj)
+
+
+_DEMUX = _Demux()
+
+
+class _PipeDrain:
+    """Demux callback that reads and discards a pipe, so a chatty server never blocks writing to it"""
+    
+    transport_name = "STDIO stderr"
+    
+    def __init__(self, pipe):
+        self._fd = pipe.fileno()
+    
+    def _on_readable(self) -> bool:
+        try:
+            return bool(os.read(self._fd, 65536))
+        except BlockingIOError:
+            return True
+
+
+def _wait_for_line(pipe, marker: bytes, timeout: float) -> bool:
+    """Read pipe until a line containing marker arrives; False at EOF or timeout"""
+    lines = LineBuffer()
+    deadline = time.monotonic() + timeout
+    with selectors.DefaultSelector() as selector:
+        selector.register(pipe, selectors.EVENT_READ)
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not selector.select(remaining):
+                return False
+            chunk = os.read(pipe.fileno(), 65536)
+            if not chunk:
+                return False
+            if any(marker in line for line in lines.feed(chunk)):
+                return True
+
+
+class _EventStream(EventStream):
+    """EventStream read by the demux thread"""
+    
+    def close(self):
+        _DEMUX.unregister(self.sock)
+        super().close()
+
+
+# Small non-negative integer ids (all the tests use) get a preallocated slot
+_SLOT_COUNT = 64
+
+
+def _is_slot_id(request_id: Any) -> bool:
+    return type(request_id) is int and 0 <= request_id < _SLOT_COUNT
+
+
+# Their ',"id":N' frame fragments are fixed, so build them once rather than per request
+_SLOT_ID_FRAGMENTS = [b',"id":' + str(i).encode() for i in range(_SLOT_COUNT)]
+
+
+class JsonRpcClientMixin:
+    """JSON-RPC request/notification plumbing shared by the threaded clients.
+    
+    Subclasses implement _transport_send() and call _deliver() for every message
+    their reader sees; everything else happens here.
+    
+    Ids 0.._SLOT_COUNT-1 index straight into fixed lists of responses and Events;
+    any other id falls back to the responses/_events dicts.
+    """
+    
+    transport_name = "JSON-RPC"
+    notification_status = "ok"
+    
+    def _init_pending(self):
+        self.responses = {}
+        self._events: Dict[Any, threading.Event] = {}
+        self._lock = threading.Lock()
+        self._slots: List[Optional[Dict]] = [None] * _SLOT_COUNT
+        self._slot_events = [threading.Event() for _ in range(_SLOT_COUNT)]
+    
+    def _register(self, request_id: Any) -> threading.Event:
+        """Register interest in a response; call before sending so a fast reply can't be missed"""
+        if _is_slot_id(request_id):
+            self._slots[request_id] = None
+            ev = self._slot_events[request_id]
+            ev.clear()
+            return ev
+        
+        ev = threading.Event()
+        with self._lock:
+            self._events[request_id] = ev
+        return ev
+    
+    def _unregister(self, request_id: Any) -> None:
+        if _is_slot_id(request_id):
+            self._slot_events[request_id].set()  # Later waits on this id return at once
+            return
+        
+        with self._lock:
+            self._events.pop(request_id, None)
+    
+    def _pending_event(self, request_id: Any) -> Optional[threading.Event]:
+        if _is_slot_id(request_id):
+            return self._slot_events[request_id]
+        
+        with self._lock:
+            return self._events.get(request_id)
+    
+    def _deliver(self, message: Dict) -> None:
+        """Store a response read off the transport and wake its sender"""
+        if not isinstance(message, dict):
+            return  # Valid JSON, but not a JSON-RPC message
+        request_id = message.get('id')
+        if _is_slot_id(request_id):
+            self._slots[request_id] = message
+            self._slot_events[request_id].set()
+        elif 'id' in message:
+            self.responses[request_id] = message
+            with self._lock:
+                ev = self._events.get(request_id)
+            if ev:
+                ev.set()
+    
+    def _take(self, request_id: Any) -> Optional[Dict]:
+        if _is_slot_id(request_id):
+            message = self._slots[request_id]
+            self._slots[request_id] = None
+            return message
+        return self.responses.pop(request_id, None)
+    
+    def _wait(self, request_id: Any, ev: threading.Event, timeout: float) -> Optional[Dict]:
+        if ev.wait(timeout):
+            return self._take(request_id)
+        return None
+    
+    def send_request(self, method: str, params: Any = None, request_id: Any = 1) -> Optional[Dict]:
+        """Send a JSON-RPC request and wait for its response"""
+        return self._send_message(_encode_message(method, params, request_id), request_id)
+    
+    def send_notification(self, method: str, params: Any = None) -> bool:
+        """Send a JSON-RPC notification"""
+        return self._send_message(_encode_message(method, params)) is not None
+    
+    def _send_message(self, message: bytes, wait_for_id: Any = None) -> Optional[Dict]:
+        """Send an encoded message and optionally wait for the response to wait_for_id"""
+        try:
+            if wait_for_id is not None:
+                ev = self._register(wait_for_id)
+            
+            if not self._transport_send(message):
+                return None
+            
+            if wait_for_id is None:
+                return {"status": self.notification_status}
+            
+            response = self._wait(wait_for_id, ev, 5.0)
+            if response is None:
+                logger.error(f"Timeout waiting for response with ID {wait_for_id}")
+            return response
+                
+        except Exception as e:
+            logger.error(f"Error sending {self.transport_name} message: {e}")
+            return None
+        finally:
+            if wait_for_id is not None:
+                self._unregister(wait_for_id)
+    
+    def _transport_send(self, message: bytes) -> bool:
+        """Hand one encoded message to the transport; responses arrive via _deliver()"""
+        raise NotImplementedError
+    
+    def _on_stream_readable(self, stream: "_EventStream") -> bool:
+        """Demux callback for an SSE stream: deliver every complete event it has read"""
+        try:
+            open_ = stream.read()
+        except (OSError, urllib3.exceptions.HTTPError) as e:
+            logger.error(f"{self.transport_name} stream reading error: {e}")
+            open_ = False
+        
+        for line in self._lines.feed(stream.body):
+            event = self._events.feed(line)
+            if event is None or event[0] == b'endpoint':
+                continue  # Mid-event, or the POST URL rather than a message
+            try:
+                self._deliver(loads(event[1]))
+            except json.JSONDecodeError:
+                pass
+        stream.body.clear()
+        
+        self.running = open_
+        return open_
+    
+    def _open_stream(self, url: str, headers: Dict[str, str]) -> bool:
+        """GET an SSE stream and hand it to the demux thread; False unless it answers 200"""
+        response = self.session.get(url, headers=headers, stream=True, timeout=(5, 30))
+        if response.status_code != 200:
+            logger.error(f"SSE stream failed with status {response.status_code}")
+            response.close()
+            return False
+        
+        self._stream = _EventStream(response.raw)
+        self._lines = LineBuffer()
+        self._events = SSEEvents()
+        self.running = True
+        # Anything that came in with the headers is already buffered and won't wake the selector
+        if self._on_readable():
+            _DEMUX.register(self._stream, self)
+        return self.running
+    
+    def send_request_nowait(self, method: str, params: Any = None, request_id: Any = 1) -> Optional[threading.Event]:
+        """Send a JSON-RPC request without waiting; collect the response with wait_all()"""
+        message = _encode_message(method, params, request_id)
+        ev = self._register(request_id)
+        try:
+            if self._transport_send(message):
+                return ev
+        except Exception as e:
+            logger.error(f"Error sending {self.transport_name} message: {e}")
+        self._unregister(request_id)
+        return None
+    
+    def wait_all(self, request_ids: List[Any], timeout: float = 10.0) -> Dict[Any, Optional[Dict]]:
+        """Wait for responses to pipelined requests, sharing one deadline across all ids"""
+        deadline = time.monotonic() + timeout
+        results = {}
+        for request_id in request_ids:
+            ev = self._pending_event(request_id)
+            try:
+                results[request_id] = self._wait(request_id, ev, max(0.0, deadline - time.monotonic())) if ev else None
+            finally:
+                self._unregister(request_id)
+        return results
+
+
+class STDIOClient(JsonRpcClientMixin):
     """Client for testing STDIO transport"""
     
+    transport_name = "STDIO"
+    
     def __init__(self, server_path: str = "./mcp-server"):
         self.server_path = server_path
         self.process = None
-        self.responses = {}
+        self._init_pending()
+        self._lines = LineBuffer()
         self.running = False
         
     def start(self) -> bool:
@@ -30,115 +397,81 @@ class STDIOClient:
                 [self.server_path, "--transport", "stdio", "--debug"],
                 stdin=subprocess.PIPE,
                 stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                bufsize=0
+                stderr=subprocess.PIPE  # Read for the startup line, then drained by the demux thread
             )
+            _grow_pipe(self.process.stdin)
+            _grow_pipe(self.process.stdout)
             self.running = True
             
-            # Start reading responses
-            self.read_thread = threading.Thread(target=self._read_responses)
-            self.read_thread.daemon = True
-            self.read_thread.start()
+            # Responses are read by the shared demux thread; no reader thread of our own
+            os.set_blocking(self.process.stdout.fileno(), False)
+            _DEMUX.register(self.process.stdout, self)
             
-            time.sleep(0.5)  # Give process time to start
+            if not _wait_for_line(self.process.stderr, READY_MARKER, timeout=2):
+                logger.warning("⚠️ No startup log from the STDIO server, sending requests anyway")
+            os.set_blocking(self.process.stderr.fileno(), False)
+            _DEMUX.register(self.process.stderr, _PipeDrain(self.process.stderr))
             return True
             
         except Exception as e:
-            print(f"Error starting STDIO server: {e}")
+            logger.error(f"Error starting STDIO server: {e}")
             return False
     
-    def _read_responses(self):
-        """Read responses from stdout"""
-        while self.running and self.process:
-            try:
-                line = self.process.stdout.readline()
-                if not line:
-                    break
-                    
-                line = line.strip()
-                if line:
-                    try:
-                        response = json.loads(line)
-                        if 'id' in response:
-                            self.responses[response['id']] = response
-                    except json.JSONDecodeError:
-                        pass  # Ignore non-JSON lines
-                        
-            except Exception as e:
-                print(f"Error reading STDIO response: {e}")
-                break
-    
-    def send_request(self, method: str, params: Any = None, request_id: Any = 1) -> Optional[Dict]:
-        """Send a JSON-RPC request"""
-        message = {
-            "jsonrpc": "2.0",
-            "method": method,
-            "id": request_id
-        }
+    def _on_readable(self) -> bool:
+        """Demux callback: read whatever stdout has buffered and deliver every complete line"""
+        try:
+            data = os.read(self.process.stdout.fileno(), _PIPE_SIZE)
+        except BlockingIOError:
+            return True
+        if not data:
+            self.running = False  # Server closed stdout
+            return False
         
-        if params is not None:
-            message["params"] = params
-            
-        return self._send_message(message, request_id)
+        for line in self._lines.feed(data):
+            if line:
+                try:
+                    self._deliver(loads(line))
+                except json.JSONDecodeError:
+                    pass  # Ignore non-JSON lines
+        return True
     
-    def send_notification(self, method: str, params: Any = None) -> bool:
-        """Send a JSON-RPC notification"""
-        message = {
-            "jsonrpc": "2.0",
-            "method": method
-        }
+    def _transport_send(self, message: bytes) -> bool:
+        """Write one message to the server's stdin"""
+        if not self.process or not self.running:
+            return False
         
-        if params is not None:
-            message["params"] = params
-            
-        return self._send_message(message) is not None
-    
-    def _send_message(self, message: Dict, wait_for_id: Any = None) -> Optional[Dict]:
-        """Send a message and optionally wait for response"""
-        try:
-            if not self.process or not self.running:
-                return None
-                
-            json_str = json.dumps(message)
-            self.process.stdin.write(json_str + "\n")
-            self.process.stdin.flush()
-            
-            if wait_for_id is not None:
-                # Wait for response
-                for _ in range(50):  # Wait up to 5 seconds
-                    if wait_for_id in self.responses:
-                        return self.responses.pop(wait_for_id)
-                    time.sleep(0.1)
-                return None
-            else:
-                return {"status": "ok"}
-                
-        except Exception as e:
-            print(f"Error sending STDIO message: {e}")
-            return None
+        _write_line(self.process.stdin, message)
+        return True
     
     def close(self):
         """Close the client connection"""
         self.running = False
         if self.process:
+            _DEMUX.unregister(self.process.stdout)
+            _DEMUX.unregister(self.process.stderr)
+            self.process.stdin.close()
             self.process.terminate()
-            self.process.wait(timeout=5)
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
 
 
-class SSEClient:
+class SSEClient(JsonRpcClientMixin):
     """Client for testing SSE transport"""
     
+    transport_name = "SSE"
+    notification_status = "accepted"
+    
     def __init__(self, base_url: str = "http://localhost:8080"):
         self.base_url = base_url
-        self.session = requests.Session()
+        self.session = new_session()
         self.session_id = f"test-session-{int(time.time())}"
         self.sse_url = f"{base_url}/sse?sessionId={self.session_id}"
         self.message_url = f"{base_url}/message?sessionId={self.session_id}"
-        self.responses = {}
+        self._init_pending()
         self.running = False
-        self.sse_thread = None
-        self.stop_event = threading.Event()
+        self._stream = None
         
     def start(self) -> bool:
         """Start the SSE connection"""
@@ -148,124 +481,60 @@ class SSEClient:
             if health_response.status_code != 200:
                 return False
                 
-            # Start SSE stream
-            self.sse_thread = threading.Thread(target=self._listen_sse)
-            self.sse_thread.daemon = True
-            self.sse_thread.start()
-            
-            time.sleep(0.5)  # Give stream time to establish
-            return self.running
+            # Start SSE stream; the server registers the session before its first flush,
+            # so a 200 means ready. The demux thread reads it from here on
+            return self._open_stream(self.sse_url, {
+                'Accept': SSE_ACCEPT,
+                'Accept-Encoding': 'identity',
+                'Cache-Control': 'no-cache'
+            })
                 
         except Exception as e:
-            print(f"Error starting SSE client: {e}")
+            logger.error(f"Error starting SSE client: {e}")
             return False
     
-    def _listen_sse(self):
-        """Listen for SSE events"""
-        try:
-            headers = {
-                'Accept': 'text/event-stream',
-                'Cache-Control': 'no-cache',
-                'Connection': 'keep-alive'
-            }
-            
-            response = self.session.get(self.sse_url, headers=headers, stream=True, timeout=None)
-            
-            if response.status_code == 200:
-                self.running = True
-                
-                for line in response.iter_lines(decode_unicode=True):
-                    if self.stop_event.is_set():
-                        break
-                        
-                    if line and line.startswith('data: '):
-                        data = line[6:]  # Remove 'data: ' prefix
-                        if data.strip() and not data.startswith('/message'):
-                            try:
-                                message = json.loads(data)
-                                if 'id' in message:
-                                    self.responses[message['id']] = message
-                            except json.JSONDecodeError:
-                                pass
-                                
-        except Exception as e:
-            print(f"SSE stream reading error: {e}")
-        finally:
-            self.running = False
-    
-    def send_request(self, method: str, params: Any = None, request_id: Any = 1) -> Optional[Dict]:
-        """Send a JSON-RPC request"""
-        message = {
-            "jsonrpc": "2.0",
-            "method": method,
-            "id": request_id
-        }
-        
-        if params is not None:
-            message["params"] = params
-            
-        return self._send_message(message, request_id)
-    
-    def send_notification(self, method: str, params: Any = None) -> bool:
-        """Send a JSON-RPC notification"""
-        message = {
-            "jsonrpc": "2.0",
-            "method": method
-        }
+    def _on_readable(self) -> bool:
+        """Demux callback for the SSE stream"""
+        return self._on_stream_readable(self._stream)
+    
+    def _transport_send(self, message: bytes) -> bool:
+        """POST one message; the response arrives on the stream"""
+        response = self.session.post(
+            self.message_url,
+            data=message,
+            headers=_JSON_HEADERS,
+            timeout=10
+        )
         
-        if params is not None:
-            message["params"] = params
-            
-        return self._send_message(message) is not None
-    
-    def _send_message(self, message: Dict, wait_for_id: Any = None) -> Optional[Dict]:
-        """Send a message and optionally wait for response"""
-        try:
-            response = self.session.post(
-                self.message_url,
-                json=message,
-                timeout=10
-            )
-            
-            if response.status_code not in [200, 202]:
-                print(f"POST failed with status {response.status_code}: {response.text}")
-                return None
-            
-            if wait_for_id is not None:
-                # Wait for response via SSE stream
-                for _ in range(50):  # Wait up to 5 seconds
-                    if wait_for_id in self.responses:
-                        return self.responses.pop(wait_for_id)
-                    time.sleep(0.1)
-                print(f"Timeout waiting for response with ID {wait_for_id}")
-                return None
-            else:
-                return {"status": "accepted"}
-                
-        except Exception as e:
-            print(f"Error sending SSE message: {e}")
-            return None
+        if response.status_code not in [200, 202]:
+            logger.error(f"POST failed with status {response.status_code}: {response.text}")
+            return False
+        return True
     
     def close(self):
         """Close the client connection"""
-        self.stop_event.set()
+        if self._stream:
+            self._stream.close()
         self.running = False
-        if self.sse_thread:
-            self.sse_thread.join(timeout=1)
+        self.session.close()
 
 
-class HTTPStreamsClient:
+class HTTPStreamsClient(JsonRpcClientMixin):
     """Client for testing HTTP Streams transport"""
     
+    transport_name = "HTTP Streams"
+    notification_status = "accepted"
+    
     def __init__(self, base_url: str = "http://localhost:8080"):
         self.base_url = base_url
-        self.session = requests.Session()
-        self.stream_response = None
-        self.stream_thread = None
-        self.responses = {}
+        self.session = new_session()
+        self._stream = None
+        self._init_pending()
         self.running = False
         self.session_id = None
         self.initialized = False
+        self.mcp_url = f"{base_url}/mcp"
+        self._post_headers = None
         
     def start(self) -> bool:
         """Start the HTTP Streams connection"""
@@ -289,80 +558,51 @@ class HTTPStreamsClient:
             }
             
             response = self.session.post(
-                f"{self.base_url}/mcp",
-                json=init_message,
+                self.mcp_url,
+                data=dumps(init_message),
+                headers=_JSON_HEADERS,
                 timeout=10
             )
             
             if response.status_code != 200:
-                print(f"Initialize failed with status {response.status_code}: {response.text}")
+                logger.error(f"Initialize failed with status {response.status_code}: {response.text}")
                 return False
             
             init_response = response.json()
             
             # Check for session ID in response headers (HTTP Streams) or body (SSE)
-            if 'Mcp-Session-Id' in response.headers:
-                self.session_id = response.headers['Mcp-Session-Id']
-                print(f"Got session ID from header: {self.session_id}")
+            if SESSION_HEADER in response.headers:
+                self.session_id = response.headers[SESSION_HEADER]
+                logger.info(f"Got session ID from header: {self.session_id}")
             elif 'result' in init_response and 'sessionId' in init_response['result']:
                 self.session_id = init_response['result']['sessionId']
-                print(f"Got session ID from body: {self.session_id}")
+                logger.info(f"Got session ID from body: {self.session_id}")
             else:
-                print(f"No session ID in initialize response: {init_response}")
+                logger.info(f"No session ID in initialize response: {init_response}")
                 return False
-                
-            # Now start SSE stream with session ID
-            headers = {
-                'Accept': 'text/event-stream',
-                'Cache-Control': 'no-cache',
-                'Connection': 'keep-alive',
-                'Mcp-Session-Id': self.session_id
-            }
-            
-            stream_response = self.session.get(
-                f"{self.base_url}/mcp",
-                headers=headers,
-                stream=True,
-                timeout=None
-            )
             
-            if stream_response.status_code == 200:
-                self.stream_response = stream_response
-                self.running = True
-                self.stream_thread = threading.Thread(target=self._read_stream)
-                self.stream_thread.daemon = True
-                self.stream_thread.start()
+            # Headers for every later POST, built once per session
+            self._post_headers = {
+                'Content-Type': JSONRPC_CONTENT_TYPE,
+                SESSION_HEADER: self.session_id
+            }
                 
-                time.sleep(0.5)  # Give stream time to establish
-                self.initialized = True
-                return True
-            else:
-                print(f"SSE stream failed with status {stream_response.status_code}")
-                return False
+            # Now start SSE stream with session ID; the demux thread reads it from here on
+            self.initialized = self._open_stream(self.mcp_url, {
+                'Accept': SSE_ACCEPT,
+                'Accept-Encoding': 'identity',
+                'Cache-Control': 'no-cache',
+                SESSION_HEADER: self.session_id
+            })
+            return self.initialized
                 
         except Exception as e:
-            print(f"Error starting HTTP Streams client: {e}")
+            logger.error(f"Error starting HTTP Streams client: {e}")
             return False
     
-    def _read_stream(self):
-        """Read stream data"""
-        try:
-            for line in self.stream_response.iter_lines(decode_unicode=True):
-                if not self.running:
-                    break
-                    
-                if line and line.startswith('data: '):
-                    data = line[6:]  # Remove 'data: ' prefix
-                    if data.strip():
-                        try:
-                            message = json.loads(data)
-                            if 'id' in message:
-                                self.responses[message['id']] = message
-                        except json.JSONDecodeError:
-                            pass
-                            
-        except Exception as e:
-            print(f"HTTP Streams reading error: {e}")
+    def _on_readable(self) -> bool:
+        """Demux callback for the HTTP Streams event stream"""
+        return self._on_stream_readable(self._stream)
     
     def send_request(self, method: str, params: Any = None, request_id: Any = 1) -> Optional[Dict]:
         """Send a JSON-RPC request"""
@@ -370,80 +610,113 @@ class HTTPStreamsClient:
         if method == "initialize" and self.initialized:
             return {"result": {"protocolVersion": "2024-11-05", "capabilities": {}}}
         
-        message = {
-            "jsonrpc": "2.0",
-            "method": method,
-            "id": request_id
-        }
-        
-        if params is not None:
-            message["params"] = params
-            
-        return self._send_message(message, request_id)
+        return super().send_request(method, params, request_id)
     
-    def send_notification(self, method: str, params: Any = None) -> bool:
-        """Send a JSON-RPC notification"""
-        message = {
-            "jsonrpc": "2.0",
-            "method": method
-        }
+    def send_request_nowait(self, method: str, params: Any = None, request_id: Any = 1) -> Optional[threading.Event]:
+        """Send a JSON-RPC request without waiting; collect the response with wait_all()"""
+        # Initialize request is already handled in start(), queue the mock response
+        if method == "initialize" and self.initialized:
+            ev = self._register(request_id)
+            self._deliver({"id": request_id, "result": {"protocolVersion": "2024-11-05", "capabilities": {}}})
+            return ev
         
-        if params is not None:
-            message["params"] = params
-            
-        return self._send_message(message) is not None
-    
-    def _send_message(self, message: Dict, wait_for_id: Any = None) -> Optional[Dict]:
-        """Send a message and optionally wait for response"""
-        try:
-            headers = {
-                'Content-Type': 'application/json',
-                'Mcp-Session-Id': self.session_id
-            }
-            
-            response = self.session.post(
-                f"{self.base_url}/mcp",
-                json=message,
-                headers=headers,
-                timeout=10
-            )
-            
-            if response.status_code not in [200, 202]:
-                print(f"POST failed with status {response.status_code}: {response.text}")
-                return None
-            
-            if wait_for_id is not None:
-                # Wait for response via stream
-                for _ in range(50):  # Wait up to 5 seconds
-                    if wait_for_id in self.responses:
-                        return self.responses.pop(wait_for_id)
-                    time.sleep(0.1)
-                print(f"Timeout waiting for response with ID {wait_for_id}")
-                return None
-            else:
-                return {"status": "accepted"}
-                
-        except Exception as e:
-            print(f"Error sending HTTP Streams message: {e}")
-            return None
+        return super().send_request_nowait(method, params, request_id)
+    
+    def _transport_send(self, message: bytes) -> bool:
+        """POST one message; the response arrives on the stream"""
+        response = self.session.post(
+            self.mcp_url,
+            data=message,
+            headers=self._post_headers,
+            timeout=10
+        )
+        
+        if response.status_code not in [200, 202]:
+            logger.error(f"POST failed with status {response.status_code}: {response.text}")
+            return False
+        return True
     
     def close(self):
         """Close the client connection"""
+        if self._stream:
+            self._stream.close()
         self.running = False
-        if self.stream_response:
-            try:
-                self.stream_response.close()
-            except Exception:
-                pass  # Ignore cleanup errors
-        if self.stream_thread:
-            self.stream_thread.join(timeout=1)
+        self.session.close()
+
+
+def _test_requests(transport: str) -> List[tuple]:
+    """The (method, params, id) requests every transport test pipelines"""
+    return [
+        ("initialize", {
+            "protocolVersion": "2024-11-05",
+            "capabilities": {},
+            "clientInfo": {
+                "name": f"test-client-{transport}",
+                "version": "1.0.0"
+            }
+        }, 1),
+        ("tools/list", {}, 2),
+        ("tools/call", {
+            "name": "echo",
+            "arguments": {"message": f"Hello from {transport}!"}
+        }, 3),
+    ]
+
+
+def _report_transport_results(transport: str, notified: bool, responses: Dict[Any, Optional[Dict]]) -> bool:
+    """Check and print the collected responses in test order"""
+    # Test 1: Initialize
+    logger.info(f"\n📋 Test 1: Initialize")
+    response = responses.get(1)
+    if response and "result" in response:
+        logger.info(f"✅ Initialize successful")
+        logger.info(f"   Server: {response['result'].get('serverInfo', {}).get('name', 'unknown')}")
+        logger.info(f"   Version: {response['result'].get('serverInfo', {}).get('version', 'unknown')}")
+    else:
+        logger.info(f"❌ Initialize failed")
+        return False
+    
+    # Test 2: Initialized notification
+    logger.info(f"\n📋 Test 2: Initialized notification")
+    if notified:
+        logger.info(f"✅ Initialized notification sent")
+    else:
+        logger.info(f"❌ Initialized notification failed")
+    
+    # Test 3: List tools
+    logger.info(f"\n📋 Test 3: List tools")
+    response = responses.get(2)
+    if response and "result" in response:
+        tools = response['result'].get('tools', [])
+        logger.info(f"✅ Tools list successful: {len(tools)} tools found")
+        for tool in tools:
+            logger.info(f"   - {tool.get('name', 'unknown')}: {tool.get('description', 'no description')}")
+    else:
+        logger.info(f"❌ Tools list failed")
+        return False
+    
+    # Test 4: Call echo tool
+    logger.info(f"\n📋 Test 4: Call echo tool")
+    response = responses.get(3)
+    if response and "result" in response:
+        content = response['result'].get('content', [])
+        if content and len(content) > 0:
+            logger.info(f"✅ Echo tool successful: {content[0].get('text', 'no text')}")
+        else:
+            logger.info(f"✅ Echo tool successful: {response['result']}")
+    else:
+        logger.info(f"❌ Echo tool failed")
+        return False
+    
+    logger.info(f"\n🎉 All {transport} tests passed!")
+    return True
 
 
 def run_transport_tests(transport: str, port: int = 8080) -> bool:
     """Run tests for a specific transport"""
-    print(f"\n{'='*60}")
-    print(f"🧪 Testing {transport.upper()} Transport")
-    print(f"{'='*60}")
+    logger.info(f"\n{'='*60}")
+    logger.info(f"🧪 Testing {transport.upper()} Transport")
+    logger.info(f"{'='*60}")
     
     # Create appropriate client
     if transport == "stdio":
@@ -453,83 +726,53 @@ def run_transport_tests(transport: str, port: int = 8080) -> bool:
     elif transport == "http-streams":
         client = HTTPStreamsClient(f"http://localhost:{port}")
     else:
-        print(f"❌ Unknown transport: {transport}")
+        logger.info(f"❌ Unknown transport: {transport}")
         return False
     
     try:
         # Start client
-        print(f"🔌 Starting {transport} client...")
+        logger.info(f"🔌 Starting {transport} client...")
         if not client.start():
-            print(f"❌ Failed to start {transport} client")
-            return False
-        
-        print(f"✅ {transport} client started successfully")
-        
-        # Test 1: Initialize
-        print(f"\n📋 Test 1: Initialize")
-        response = client.send_request("initialize", {
-            "protocolVersion": "2024-11-05",
-            "capabilities": {},
-            "clientInfo": {
-                "name": f"test-client-{transport}",
-                "version": "1.0.0"
-            }
-        }, 1)
-        
-        if response and "result" in response:
-            print(f"✅ Initialize successful")
-            print(f"   Server: {response['result'].get('serverInfo', {}).get('name', 'unknown')}")
-            print(f"   Version: {response['result'].get('serverInfo', {}).get('version', 'unknown')}")
-        else:
-            print(f"❌ Initialize failed")
-            return False
-        
-        # Test 2: Initialized notification
-        print(f"\n📋 Test 2: Initialized notification")
-        if client.send_notification("initialized"):
-            print(f"✅ Initialized notification sent")
-        else:
-            print(f"❌ Initialized notification failed")
-        
-        # Test 3: List tools
-        print(f"\n📋 Test 3: List tools")
-        response = client.send_request("tools/list", {}, 2)
-        if response and "result" in response:
-            tools = response['result'].get('tools', [])
-            print(f"✅ Tools list successful: {len(tools)} tools found")
-            for tool in tools:
-                print(f"   - {tool.get('name', 'unknown')}: {tool.get('description', 'no description')}")
-        else:
-            print(f"❌ Tools list failed")
+            logger.error(f"❌ Failed to start {transport} client")
             return False
         
-        # Test 4: Call echo tool
-        print(f"\n📋 Test 4: Call echo tool")
-        response = client.send_request("tools/call", {
-            "name": "echo",
-            "arguments": {"message": f"Hello from {transport}!"}
-        }, 3)
+        logger.info(f"✅ {transport} client started successfully")
         
-        if response and "result" in response:
-            content = response['result'].get('content', [])
-            if content and len(content) > 0:
-                print(f"✅ Echo tool successful: {content[0].get('text', 'no text')}")
-            else:
-                print(f"✅ Echo tool successful: {response['result']}")
-        else:
-            print(f"❌ Echo tool failed")
-            return False
+        # Pipeline every request back-to-back, then collect responses by id
+        init_request, *tool_requests = _test_requests(transport)
+        client.send_request_nowait(*init_request)
+        notified = client.send_notification("initialized")
+        for request in tool_requests:
+            client.send_request_nowait(*request)
         
-        print(f"\n🎉 All {transport} tests passed!")
-        return True
+        responses = client.wait_all([request_id for _, _, request_id in (init_request, *tool_requests)])
+        return _report_transport_results(transport, notified, responses)
         
     except Exception as e:
-        print(f"❌ Test error for {transport}: {e}")
+        logger.error(f"❌ Test error for {transport}: {e}")
         return False
     finally:
         client.close()
 
 
+# Delays between /health probes while a server boots (about 5s in total)
+_READY_BACKOFF = (0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 1.0, 1.0, 1.0)
+
+
+def wait_ready(port: int, process: subprocess.Popen = None) -> bool:
+    """Poll /health with short backoff until the server answers 200"""
+    for delay in _READY_BACKOFF:
+        if process is not None and process.poll() is not None:
+            return False  # Server exited during startup
+        try:
+            if requests.get(f"http://localhost:{port}/health", timeout=0.5).status_code == 200:
+                return True
+        except requests.RequestException:
+            pass  # Not listening yet
+        time.sleep(delay)
+    return False
+
+
 def start_server(transport: str, port: int) -> subprocess.Popen:
     """Start a server for the given transport"""
     if transport == "stdio":
@@ -544,10 +787,13 @@ def start_server(transport: str, port: int) -> subprocess.Popen:
             stderr=subprocess.PIPE,
             text=True
         )
-        time.sleep(2)  # Give server time to start
+        if not wait_ready(port, process):
+            logger.error(f"Error starting {transport} server: not healthy on port {port}")
+            process.kill()
+            return None
         return process
     except Exception as e:
-        print(f"Error starting {transport} server: {e}")
+        logger.error(f"Error starting {transport} server: {e}")
         return None
 
 
@@ -565,7 +811,7 @@ def test_single_transport(transport: str, port: int = 8080) -> Dict[str, Any]:
     try:
         # Start server if needed
         if transport != "stdio":
-            print(f"🚀 Starting {transport} server on port {port}...")
+            logger.info(f"🚀 Starting {transport} server on port {port}...")
             server_process = start_server(transport, port)
             if not server_process:
                 result["error"] = f"Failed to start {transport} server"
@@ -588,22 +834,11 @@ def test_single_transport(transport: str, port: int = 8080) -> Dict[str, Any]:
     return result
 
 
-def test_all_transports_parallel():
-    """Test all transports in parallel"""
-    print("🚀 Starting comprehensive MCP transport testing...")
-    print("Testing STDIO, SSE, and HTTP Streams transports in parallel")
-    
-    # Define transports and their ports
-    transports = [
-        ("stdio", 0),  # STDIO doesn't use a port
-        ("sse", 8081),
-        ("http-streams", 8082)
-    ]
-    
+def _run_transport_tests_threaded(transports: List[tuple]) -> List[Dict[str, Any]]:
+    """Run every transport test on its own thread"""
     results = []
     
-    # Run tests in parallel
-    with ThreadPoolExecutor(max_workers=3) as executor:
+    with ThreadPoolExecutor(max_workers=len(transports)) as executor:
         # Submit all test jobs
         future_to_transport = {
             executor.submit(test_single_transport, transport, port): transport
@@ -624,10 +859,27 @@ def test_all_transports_parallel():
                     "port": 0
                 })
     
+    return results
+
+
+def test_all_transports_parallel():
+    """Test all transports in parallel"""
+    logger.info("🚀 Starting comprehensive MCP transport testing...")
+    logger.info("Testing STDIO, SSE, and HTTP Streams transports in parallel")
+    
+    # Define transports and their ports
+    transports = [
+        ("stdio", 0),  # STDIO doesn't use a port
+        ("sse", 8081),
+        ("http-streams", 8082)
+    ]
+    
+    results = _run_transport_tests_threaded(transports)
+    
     # Print summary
-    print(f"\n{'='*80}")
-    print("📊 TEST SUMMARY")
-    print(f"{'='*80}")
+    logger.info(f"\n{'='*80}")
+    logger.info("📊 TEST SUMMARY")
+    logger.info(f"{'='*80}")
     
     passed = 0
     failed = 0
@@ -638,21 +890,21 @@ def test_all_transports_parallel():
         error = result.get("error")
         
         if success:
-            print(f"✅ {transport.upper():<12} - PASSED")
+            logger.info(f"✅ {transport.upper():<12} - PASSED")
             passed += 1
         else:
-            print(f"❌ {transport.upper():<12} - FAILED")
+            logger.info(f"❌ {transport.upper():<12} - FAILED")
             if error:
-                print(f"   Error: {error}")
+                logger.error(f"   Error: {error}")
             failed += 1
     
-    print(f"\n📈 Results: {passed} passed, {failed} failed")
+    logger.info(f"\n📈 Results: {passed} passed, {failed} failed")
     
     if failed == 0:
-        print("🎉 All transport tests passed!")
+        logger.info("🎉 All transport tests passed!")
         return True
     else:
-        print("💥 Some transport tests failed!")
+        logger.info("💥 Some transport tests failed!")
         return False
 
 
@@ -665,13 +917,17 @@ def main():
     
     args = parser.parse_args()
     
-    if args.transport == "all":
-        success = test_all_transports_parallel()
-    else:
-        result = test_single_transport(args.transport, args.port)
-        success = result["success"]
-        if not success and result.get("error"):
-            print(f"Error: {result['error']}")
+    listener = _start_log_listener()
+    try:
+        if args.transport == "all":
+            success = test_all_transports_parallel()
+        else:
+            result = test_single_transport(args.transport, args.port)
+            success = result["success"]
+            if not success and result.get("error"):
+                logger.error(f"Error: {result['error']}")
+    finally:
+        listener.stop()  # Flushes anything still queued
     
     sys.exit(0 if success else 1)
 
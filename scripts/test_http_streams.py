@@ -3,174 +3,15 @@
 Test script for HTTP Streams transport
 """
 
-import json
-import requests
-import time
-import threading
-from typing import Dict, Any, Optional
+import logging
 
-class HTTPStreamsClient:
-    def __init__(self, base_url: str = "http://localhost:8080"):
-        self.base_url = base_url
-        self.session = requests.Session()
-        self.session_id = None
-        self.stream_response = None
-        self.stream_thread = None
-        self.responses = {}
-        self.running = False
-        
-    def start_stream(self) -> bool:
-        """Start the SSE stream for receiving responses"""
-        try:
-            headers = {
-                'Accept': 'text/event-stream',
-                'Cache-Control': 'no-cache',
-                'Connection': 'keep-alive'
-            }
-            
-            if self.session_id:
-                headers['Mcp-Session-Id'] = self.session_id
-                
-            print(f"Starting SSE stream with headers: {headers}")
-            response = self.session.get(
-                f"{self.base_url}/stream",
-                headers=headers,
-                stream=True,
-                timeout=None  # No timeout for SSE stream
-            )
-            
-            print(f"SSE stream response status: {response.status_code}")
-            if response.status_code == 200:
-                self.stream_response = response
-                self.running = True
-                self.stream_thread = threading.Thread(target=self._read_stream)
-                self.stream_thread.daemon = True
-                self.stream_thread.start()
-                
-                # Give the stream a moment to establish
-                time.sleep(0.1)
-                print("SSE stream started successfully")
-                return True
-            else:
-                print(f"Failed to start stream: {response.status_code}")
-                return False
-                
-        except Exception as e:
-            print(f"Error starting stream: {e}")
-            return False
-    
-    def _read_stream(self):
-        """Read SSE events from the stream"""
-        try:
-            print("Starting to read SSE stream...")
-            for line in self.stream_response.iter_lines(decode_unicode=True):
-                if not self.running:
-                    print("Stream reading stopped (running=False)")
-                    break
-                    
-                if line:
-                    print(f"SSE line received: {repr(line)}")
-                    
-                if line.startswith('data: '):
-                    data = line[6:]  # Remove 'data: ' prefix
-                    if data.strip():
-                        try:
-                            message = json.loads(data)
-                            print(f"Received: {message}")
-                            
-                            # Store response by ID for matching
-                            if 'id' in message:
-                                self.responses[message['id']] = message
-                                
-                        except json.JSONDecodeError as e:
-                            print(f"Failed to parse JSON: {e}")
-                elif line.startswith(':'):
-                    print(f"SSE comment: {line}")
-                            
-        except Exception as e:
-            print(f"Stream reading error: {e}")
-        finally:
-            print("SSE stream reading ended")
-    
-    def send_request(self, method: str, params: Any = None, request_id: Any = 1) -> Optional[Dict]:
-        """Send a JSON-RPC request"""
-        message = {
-            "jsonrpc": "2.0",
-            "method": method,
-            "id": request_id
-        }
-        
-        if params is not None:
-            message["params"] = params
-            
-        return self._send_message(message, request_id)
-    
-    def send_notification(self, method: str, params: Any = None) -> bool:
-        """Send a JSON-RPC notification (no response expected)"""
-        message = {
-            "jsonrpc": "2.0",
-            "method": method
-        }
-        
-        if params is not None:
-            message["params"] = params
-            
-        return self._send_message(message) is not None
-    
-    def _send_message(self, message: Dict, wait_for_id: Any = None) -> Optional[Dict]:
-        """Send a message and optionally wait for response"""
-        try:
-            headers = {
-                'Content-Type': 'application/json',
-                'Accept': 'application/json, text/event-stream'
-            }
-            
-            if self.session_id:
-                headers['Mcp-Session-Id'] = self.session_id
-                
-            response = self.session.post(
-                f"{self.base_url}/message",
-                json=message,
-                headers=headers,
-                timeout=10
-            )
-            
-            print(f"POST response: {response.status_code}")
-            
-            # HTTP Streams always sends responses via the stream, not direct JSON
-            if response.status_code not in [200, 202]:
-                return None
-            
-            if wait_for_id is not None:
-                # Wait for response via SSE stream
-                for _ in range(50):  # Wait up to 5 seconds
-                    if wait_for_id in self.responses:
-                        return self.responses.pop(wait_for_id)
-                    time.sleep(0.1)
-                    
-                print(f"Timeout waiting for response to request {wait_for_id}")
-                return None
-            else:
-                # For notifications, just return success status
-                return {"status": "ok"} if response.status_code in [200, 202] else None
-                
-        except Exception as e:
-            print(f"Error sending message: {e}")
-            return None
-    
-    def close(self):
-        """Close the client connection"""
-        self.running = False
-        if self.stream_response:
-            self.stream_response.close()
-        if self.stream_thread:
-            self.stream_thread.join(timeout=1)
+from _mcp_test_client import HTTPStreamsClient
 
 def test_http_streams():
     """Test HTTP Streams transport"""
     print("Testing HTTP Streams transport...")
     
-    client = HTTPStreamsClient()
+    client = HTTPStreamsClient(stream_path="/stream", message_path="/message")
     
     try:
         # Start the stream first for HTTP Streams
@@ -178,7 +19,6 @@ def test_http_streams():
         if not client.start_stream():
             print("Failed to start stream")
             return False
-        time.sleep(0.5)  # Give stream time to establish
         
         # Test 1: Initialize
         print("\n2. Testing initialize...")
@@ -241,5 +81,6 @@ def test_http_streams():
         client.close()
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     success = test_http_streams()
     exit(0 if success else 1)
\ No newline at end of file
@@ -4,133 +4,13 @@ HTTP Streams Integration Test Script for MCP Server Framework
 This script tests the HTTP Streams transport with proper SSE stream handling.
 """
 
-import json
 import requests
 import time
 import sys
-import threading
 import subprocess
-import signal
-import os
-from urllib.parse import urljoin
 
-class HTTPStreamsClient:
-    def __init__(self, base_url):
-        self.base_url = base_url
-        self.mcp_url = f"{base_url}/mcp"
-        self.sse_url = f"{base_url}/mcp"  # Same endpoint for SSE streams
-        self.session_id = None
-        self.session = requests.Session()
-        self.responses = {}
-        self.running = False
-        self.sse_thread = None
-        self.stop_event = threading.Event()
-        
-    def start_sse_stream(self):
-        """Start the SSE stream for receiving responses"""
-        if not self.session_id:
-            print("❌ Cannot start SSE stream without session ID")
-            return False
-            
-        try:
-            self.sse_thread = threading.Thread(target=self._listen_sse)
-            self.sse_thread.daemon = True
-            self.sse_thread.start()
-            time.sleep(0.5)  # Give stream time to establish
-            return self.running
-        except Exception as e:
-            print(f"Error starting SSE stream: {e}")
-            return False
-    
-    def _listen_sse(self):
-        """Listen for SSE events"""
-        try:
-            headers = {
-                'Accept': 'text/event-stream',
-                'Cache-Control': 'no-cache',
-                'Connection': 'keep-alive',
-                'Mcp-Session-Id': self.session_id
-            }
-            
-            response = self.session.get(self.sse_url, headers=headers, stream=True, timeout=None)
-            
-            if response.status_code == 200:
-                self.running = True
-                print(f"✓ SSE stream established for session {self.session_id}")
-                
-                for line in response.iter_lines(decode_unicode=True):
-                    if self.stop_event.is_set():
-                        break
-                        
-                    if line and line.startswith('data: '):
-                        data = line[6:]  # Remove 'data: ' prefix
-                        if data.strip() and not data.startswith(':'):
-                            try:
-                                message = json.loads(data)
-                                if 'id' in message:
-                                    self.responses[message['id']] = message
-                                    print(f"← SSE Response: {json.dumps(message, indent=2)}")
-                            except json.JSONDecodeError:
-                                pass
-            else:
-                print(f"❌ SSE stream failed with status {response.status_code}")
-                                
-        except Exception as e:
-            print(f"SSE stream error: {e}")
-        finally:
-            self.running = False
-    
-    def send_message(self, message, wait_for_response=True):
-        """Send a message to the MCP server"""
-        try:
-            headers = {"Content-Type": "application/json"}
-            
-            # Add session ID header if we have one
-            if self.session_id:
-                headers["Mcp-Session-Id"] = self.session_id
-            
-            response = self.session.post(
-                self.mcp_url,
-                json=message,
-                headers=headers,
-                timeout=10
-            )
-            response.raise_for_status()
-            
-            # Extract session ID from response headers if present
-            if 'Mcp-Session-Id' in response.headers:
-                self.session_id = response.headers['Mcp-Session-Id']
-                print(f"📝 Session ID: {self.session_id}")
-            
-            # For initialize, return direct response
-            if message.get('method') == 'initialize':
-                return response.json()
-            
-            # For other messages, wait for response via SSE if requested
-            if wait_for_response and 'id' in message:
-                request_id = message['id']
-                # Wait for response via SSE stream
-                for _ in range(50):  # Wait up to 5 seconds
-                    if request_id in self.responses:
-                        return self.responses.pop(request_id)
-                    time.sleep(0.1)
-                print(f"❌ Timeout waiting for response with ID {request_id}")
-                return None
-            
-            # Handle empty responses (for notifications)
-            if response.status_code == 204 or not response.text.strip():
-                return None
-            
-            return response.json()
-        except Exception as e:
-            print(f"Error sending message: {e}")
-            return None
-    
-    def close(self):
-        """Close the client connection"""
-        self.stop_event.set()
-        if self.sse_thread and self.sse_thread.is_alive():
-            self.sse_thread.join(timeout=1)
+from _mcp_common import configure_logging, ensure_server_built, pretty_json, spawn_server
+from _mcp_test_client import HTTPStreamsClient
 
 def test_mcp_workflow(base_url=None):
     """Test complete MCP workflow via HTTP Streams"""
@@ -173,11 +53,11 @@ def test_mcp_workflow(base_url=None):
             }
         }
         
-        print(f"→ Sending: {json.dumps(init_message, indent=2)}")
+        print(f"→ Sending: {pretty_json(init_message)}")
         response = client.send_message(init_message)
         
         if response and response.get('result'):
-            print(f"← Received: {json.dumps(response, indent=2)}")
+            print(f"← Received: {pretty_json(response)}")
             print(f"✓ Initialize successful")
         else:
             print(f"❌ Initialize failed: {response}")
@@ -185,7 +65,7 @@ def test_mcp_workflow(base_url=None):
         
         # Test 2: Start SSE stream
         print("\n📡 Test 2: Start SSE stream")
-        if not client.start_sse_stream():
+        if not client.start_stream():
             print("❌ Failed to start SSE stream")
             return False
         
@@ -197,7 +77,7 @@ def test_mcp_workflow(base_url=None):
             "method": "tools/list"
         }
         
-        print(f"→ Sending: {json.dumps(tools_message, indent=2)}")
+        print(f"→ Sending: {pretty_json(tools_message)}")
         response = client.send_message(tools_message)
         
         if response and response.get('result', {}).get('tools'):
@@ -221,7 +101,7 @@ def test_mcp_workflow(base_url=None):
             }
         }
         
-        print(f"→ Sending: {json.dumps(call_message, indent=2)}")
+        print(f"→ Sending: {pretty_json(call_message)}")
         response = client.send_message(call_message)
         
         if response and response.get('result', {}).get('content'):
@@ -248,42 +128,35 @@ def test_mcp_workflow(base_url=None):
 def start_server(port=8080):
     """Start the MCP server for testing"""
     try:
-        # Build the server first
-        print("🔨 Building MCP server...")
-        build_result = subprocess.run(['make', 'build'], 
-                                    capture_output=True, text=True, timeout=30)
-        if build_result.returncode != 0:
-            print(f"❌ Build failed: {build_result.stderr}")
+        if not ensure_server_built():
             return None
         
-        print("✓ Build successful")
-        
         # Start the server
         print(f"🚀 Starting HTTP Streams server on port {port}...")
-        server_process = subprocess.Popen([
+        server_process = spawn_server([
             './mcp-server', 
             '-transport=http-streams', 
             f'-addr={port}',
             '-debug'
         ])
         
-        # Wait for server to start
-        time.sleep(2)
-        
-        # Check if server is running
-        try:
-            health_response = requests.get(f"http://localhost:{port}/health", timeout=5)
-            if health_response.status_code == 200:
-                print(f"✓ Server started successfully on port {port}")
-                return server_process
-            else:
-                print(f"❌ Server health check failed")
-                server_process.terminate()
+        # Poll /health until it answers rather than sleeping a fixed 2s
+        for _ in range(50):
+            if server_process.poll() is not None:
+                print(f"❌ Server exited with code {server_process.returncode}")
                 return None
-        except Exception as e:
-            print(f"❌ Server not responding: {e}")
-            server_process.terminate()
-            return None
+            try:
+                health_response = requests.get(f"http://localhost:{port}/health", timeout=0.2)
+                if health_response.status_code == 200:
+                    print(f"✓ Server started successfully on port {port}")
+                    return server_process
+            except requests.exceptions.RequestException:
+                pass  # Not listening yet
+            time.sleep(0.1)
+        
+        print(f"❌ Server not responding on port {port}")
+        server_process.terminate()
+        return None
             
     except Exception as e:
         print(f"❌ Failed to start server: {e}")
@@ -296,8 +169,11 @@ def main():
     parser.add_argument("--port", type=int, default=8081, help="Port to run server on")
     parser.add_argument("--external-server", action="store_true", 
                        help="Use external server instead of starting our own")
+    parser.add_argument("--verbose", action="store_true",
+                       help="Log every SSE event received")
     
     args = parser.parse_args()
+    configure_logging(args.verbose)
     
     port = args.port
     base_url = f"http://localhost:{port}"
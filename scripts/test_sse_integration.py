@@ -4,134 +4,268 @@ SSE Integration Test Script for MCP Server Framework
 This script properly handles SSE connections and MCP protocol testing.
 """
 
+import collections
 import json
+import logging
 import requests
-import threading
+import selectors
 import time
+import urllib3
 import sys
 import subprocess
 import signal
 import os
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urljoin
 
+from _mcp_common import LineBuffer, configure_logging, dumps, ensure_server_built, loads, pretty_json, spawn_server
+from _mcp_test_client import JSONRPC_CONTENT_TYPE, SSE_ACCEPT, EventStream, SSEEvents
+
+# Full message traces cost a pretty-print per message; --verbose turns them on
+logger = logging.getLogger("mcp_test_client.sse")
+
+_JSON_HEADERS = {'Content-Type': JSONRPC_CONTENT_TYPE}
+
+# The workflow's messages
+INIT_MESSAGE = {
+    "jsonrpc": "2.0",
+    "id": 1,
+    "method": "initialize",
+    "params": {
+        "protocolVersion": "2024-11-05",
+        "capabilities": {},
+        "clientInfo": {
+            "name": "integration-test",
+            "version": "1.0.0"
+        }
+    }
+}
+
+INITIALIZED_MESSAGE = {
+    "jsonrpc": "2.0",
+    "method": "initialized"
+}
+
+TOOLS_MESSAGE = {
+    "jsonrpc": "2.0",
+    "id": 2,
+    "method": "tools/list"
+}
+
+CALL_MESSAGE = {
+    "jsonrpc": "2.0",
+    "id": 3,
+    "method": "tools/call",
+    "params": {
+        "name": "echo",
+        "arguments": {
+            "message": "Integration test message"
+        }
+    }
+}
+
+# Their wire form never changes either, so each is encoded once at import
+INIT_BODY = dumps(INIT_MESSAGE)
+INITIALIZED_BODY = dumps(INITIALIZED_MESSAGE)
+TOOLS_BODY = dumps(TOOLS_MESSAGE)
+CALL_BODY = dumps(CALL_MESSAGE)
+
 class SSEClient:
+    """Threaded-API SSE client that reads its stream inline, with no listener thread.
+    
+    The stream's socket sits under a selector; connect() and
+    wait_for_response() pump it on the calling thread until what they wait for has
+    arrived, so received frames never cross threads.
+    """
+    
     def __init__(self, base_url, session_id):
         self.base_url = base_url
         self.session_id = session_id
         self.sse_url = f"{base_url}/sse?sessionId={session_id}"
         self.message_url = f"{base_url}/message?sessionId={session_id}"
-        self.responses = []
+        self._sse_path = f"/sse?sessionId={session_id}"
+        self._message_path = f"/message?sessionId={session_id}"
+        # Responses by id, plus anything without one. Unsolicited messages are capped
+        # so a long run can't grow them without bound
+        self._by_id = {}
+        self._unmatched = collections.deque(maxlen=1024)
         self.connected = False
-        self.stop_event = threading.Event()
-        self.sse_thread = None
+        self._stream = None
+        self._selector = selectors.DefaultSelector()
+        self._lines = LineBuffer()
+        self._events = SSEEvents()
+        # POSTs and the health probe go straight to a urllib3 pool for this one host,
+        # skipping requests' URL parsing and adapter/pool lookup on every message
+        self._pool = urllib3.connection_from_url(base_url, maxsize=10, block=False, retries=False)
         
+    def health(self):
+        """Fetch /health over the client's pool"""
+        response = self._pool.request('GET', '/health', timeout=5)
+        if response.status >= 400:
+            raise RuntimeError(f"status {response.status}")
+        return loads(response.data)
+    
     def connect(self):
-        """Connect to SSE endpoint and start listening for messages"""
-        self.sse_thread = threading.Thread(target=self._listen_sse)
-        self.sse_thread.daemon = True
-        self.sse_thread.start()
+        """Connect to SSE endpoint and read until the endpoint event arrives"""
+        try:
+            response = self._pool.urlopen(
+                'GET',
+                self._sse_path,
+                headers={'Accept': SSE_ACCEPT},
+                timeout=urllib3.Timeout(connect=5, read=30),
+                preload_content=False
+            )
+        except (OSError, urllib3.exceptions.HTTPError) as e:
+            print(f"SSE connection error: {e}")
+            return False
+        if response.status != 200:
+            print(f"SSE connection error: status {response.status}")
+            response.close()
+            return False
+        self._stream = EventStream(response)
+        self._selector.register(self._stream, selectors.EVENT_READ)
         
         # Wait for connection
-        for _ in range(50):  # 5 seconds timeout
-            if self.connected:
-                return True
-            time.sleep(0.1)
-        return False
+        deadline = time.monotonic() + 5.0
+        while not self.connected:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not self.pump(remaining):
+                break
+        return self.connected
     
-    def _listen_sse(self):
-        """Listen to SSE stream"""
+    def pump(self, timeout):
+        """Wait up to timeout for stream data and dispatch every complete event; False once the stream is gone"""
+        if self._stream is None:
+            return False
+        
+        stream = self._stream
         try:
-            response = requests.get(
-                self.sse_url,
-                headers={'Accept': 'text/event-stream'},
-                stream=True,
-                timeout=30
-            )
-            response.raise_for_status()
-            
-            current_event = None
-            for line in response.iter_lines(decode_unicode=True):
-                if self.stop_event.is_set():
-                    break
-                
-                if line.startswith('event: '):
-                    current_event = line[7:]  # Remove 'event: ' prefix
-                elif line.startswith('data: '):
-                    data = line[6:]  # Remove 'data: ' prefix
-                    
-                    if current_event == 'endpoint':
-                        # This is the endpoint URL for posting messages
-                        self.connected = True
-                        print(f"✓ SSE connected, endpoint: {data}")
-                    elif current_event == 'message':
-                        # This is an MCP message
-                        try:
-                            message = json.loads(data)
-                            self.responses.append(message)
-                            print(f"← Received: {json.dumps(message, indent=2)}")
-                        except json.JSONDecodeError:
-                            print(f"Invalid JSON in message data: {data}")
-                    else:
-                        # Try to parse as JSON for backward compatibility
-                        try:
-                            message = json.loads(data)
-                            if message.get('type') == 'connected':
-                                self.connected = True
-                                print(f"✓ SSE connected with session: {message.get('sessionId')}")
-                            else:
-                                self.responses.append(message)
-                                print(f"← Received: {json.dumps(message, indent=2)}")
-                        except json.JSONDecodeError:
-                            print(f"Unknown event '{current_event}' with data: {data}")
-                elif line == '':
-                    # Empty line resets the event type
-                    current_event = None
-                        
-        except Exception as e:
+            # Data http.client has already buffered won't wake the selector, so take it first
+            open_ = stream.read()
+            if open_ and not stream.body and self._selector.select(timeout):
+                open_ = stream.read()
+        except (OSError, urllib3.exceptions.HTTPError) as e:
             print(f"SSE connection error: {e}")
+            open_ = False
+        
+        if stream.body:
+            # Split raw chunks ourselves; lines stay bytes, since loads takes them
+            # as-is and only the traces need decoding
+            for line in self._lines.feed(stream.body):
+                event = self._events.feed(line)
+                if event is not None:
+                    self._handle_event(*event)
+            stream.body.clear()
+        
+        if not open_:
+            self._close_stream()
+        return open_
+    
+    def _handle_event(self, event, data):
+        """Act on one complete SSE event.
+        
+        Servers either name every event (endpoint / message) or send bare legacy
+        JSON data.
+        """
+        if event == b'endpoint':
+            # This is the endpoint URL for posting messages
+            print(f"✓ SSE connected, endpoint: {data.decode(errors='replace')}")
+            self.connected = True
+        elif event == b'message':
+            # This is an MCP message
+            try:
+                message = loads(data)
+                self._store(message)
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("← Received: %s", pretty_json(message))
+            except json.JSONDecodeError:
+                print(f"Invalid JSON in message data: {data.decode(errors='replace')}")
+        else:
+            self._handle_legacy_data(event, data)
+    
+    def _handle_legacy_data(self, event, data):
+        # Try to parse as JSON for backward compatibility
+        try:
+            message = loads(data)
+            if isinstance(message, dict) and message.get('type') == 'connected':
+                print(f"✓ SSE connected with session: {message.get('sessionId')}")
+                self.connected = True
+            else:
+                self._store(message)
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("← Received: %s", pretty_json(message))
+        except json.JSONDecodeError:
+            event_name = event.decode(errors='replace') if event else None
+            print(f"Unknown event '{event_name}' with data: {data.decode(errors='replace')}")
+    
+    def _store(self, message):
+        """File a received message for wait_for_response()"""
+        if isinstance(message, dict) and 'id' in message:
+            self._by_id[message['id']] = message
+        else:
+            self._unmatched.append(message)
     
-    def send_message(self, message):
-        """Send a message via POST and return the HTTP response"""
+    def send_message(self, message, body=None):
+        """Send a message via POST and return the HTTP response; body is message pre-encoded, if available"""
         try:
-            response = requests.post(
-                self.message_url,
-                json=message,
-                headers={'Content-Type': 'application/json'},
-                timeout=10
+            response = self._pool.urlopen(
+                'POST',
+                self._message_path,
+                body=body if body is not None else dumps(message),
+                headers=_JSON_HEADERS,
+                timeout=10,
+                preload_content=True
             )
-            response.raise_for_status()
+            if response.status >= 400:
+                print(f"❌ POST failed with status {response.status}")
+                return None
             # For HTTP 202 Accepted, we expect plain text response
-            if response.status_code == 202:
-                return {"status": "accepted", "text": response.text}
+            if response.status == 202:
+                return {"status": "accepted", "text": response.data.decode(errors='replace')}
             else:
-                return response.json()
+                return loads(response.data)
         except Exception as e:
             print(f"Error sending message: {e}")
             return None
     
+    def _take(self, request_id):
+        if request_id is None:
+            # Any message will do; prefer one nobody is waiting on by id
+            if self._unmatched:
+                return self._unmatched.popleft()
+            if self._by_id:
+                return self._by_id.pop(next(iter(self._by_id)))
+            return None
+        # Remove the response once taken to avoid reusing it
+        return self._by_id.pop(request_id, None)
+    
     def wait_for_response(self, request_id=None, timeout=5):
         """Wait for a response from SSE stream"""
-        start_time = time.time()
-        
-        while time.time() - start_time < timeout:
-            # Look for response with matching ID
-            for i, response in enumerate(self.responses):
-                if request_id is None or response.get('id') == request_id:
-                    # Remove the response from the list to avoid reusing it
-                    return self.responses.pop(i)
-            time.sleep(0.1)
-        return None
+        deadline = time.monotonic() + timeout
+        while True:
+            response = self._take(request_id)
+            if response is not None:
+                return response
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not self.pump(remaining):
+                return self._take(request_id)
+    
+    def _close_stream(self):
+        if self._stream is not None:
+            self._selector.unregister(self._stream)
+            self._stream.close()
+            self._stream = None
     
     def disconnect(self):
         """Disconnect from SSE"""
-        self.stop_event.set()
-        if self.sse_thread:
-            self.sse_thread.join(timeout=2)
+        self._close_stream()
+        self._selector.close()
+        self._pool.close()
 
 def test_mcp_workflow(base_url=None):
     """Test complete MCP workflow"""
     if base_url is None:
-        base_url = "http://localhost:8080"
+        base_url = "http://127.0.0.1:8080"
     session_id = f"test-session-{int(time.time())}"
     
     print(f"🧪 Starting MCP Integration Test")
@@ -139,124 +273,49 @@ def test_mcp_workflow(base_url=None):
     print(f"🆔 Session ID: {session_id}")
     print()
     
-    # Test health endpoint first
-    try:
-        health_response = requests.get(f"{base_url}/health", timeout=5)
-        health_response.raise_for_status()
-        health_data = health_response.json()
-        print(f"✓ Health check: {health_data}")
-    except Exception as e:
-        print(f"❌ Health check failed: {e}")
-        return False
-    
     # Create SSE client
     client = SSEClient(base_url, session_id)
     
     try:
-        # Connect to SSE
+        # Health check and SSE connect are independent, so overlap their round trips
         print("🔌 Connecting to SSE...")
-        if not client.connect():
-            print("❌ Failed to connect to SSE")
-            return False
-        
-        # Test 1: Initialize
-        print("\n📋 Test 1: Initialize")
-        init_message = {
-            "jsonrpc": "2.0",
-            "id": 1,
-            "method": "initialize",
-            "params": {
-                "protocolVersion": "2024-11-05",
-                "capabilities": {},
-                "clientInfo": {
-                    "name": "integration-test",
-                    "version": "1.0.0"
-                }
-            }
-        }
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            health_future = pool.submit(client.health)
+            connect_future = pool.submit(client.connect)
         
-        print(f"→ Sending: {json.dumps(init_message, indent=2)}")
-        post_response = client.send_message(init_message)
-        print(f"📤 POST response: {post_response}")
-        
-        # Wait for MCP response via SSE
-        mcp_response = client.wait_for_response(request_id=1, timeout=5)
-        if mcp_response and mcp_response.get('result', {}).get('protocolVersion'):
-            print("✓ Initialize successful")
-        else:
-            print(f"❌ Initialize failed: {mcp_response}")
+        try:
+            health_data = health_future.result()
+            print(f"✓ Health check: {health_data}")
+        except Exception as e:
+            print(f"❌ Health check failed: {e}")
             return False
         
-        # Test 2: Initialized notification
-        print("\n📋 Test 2: Initialized notification")
-        initialized_message = {
-            "jsonrpc": "2.0",
-            "method": "initialized"
-        }
-        
-        print(f"→ Sending: {json.dumps(initialized_message, indent=2)}")
-        post_response = client.send_message(initialized_message)
-        print(f"📤 POST response: {post_response}")
-        
-        # For notifications, we don't expect a response, just check if POST was successful
-        if post_response and post_response.get('status') == 'accepted':
-            print("✓ Initialized notification sent successfully")
-        else:
-            print(f"❌ Initialized notification failed: {post_response}")
-        
-        # Small delay to let any responses arrive
-        time.sleep(0.5)
-        
-        # Test 3: List tools
-        print("\n📋 Test 3: List tools")
-        tools_message = {
-            "jsonrpc": "2.0",
-            "id": 2,
-            "method": "tools/list"
-        }
-        
-        print(f"→ Sending: {json.dumps(tools_message, indent=2)}")
-        post_response = client.send_message(tools_message)
-        print(f"📤 POST response: {post_response}")
-        
-        # Wait for MCP response via SSE
-        mcp_response = client.wait_for_response(request_id=2, timeout=5)
-        if mcp_response and mcp_response.get('result', {}).get('tools'):
-            tools = mcp_response['result']['tools']
-            print(f"✓ Tools list successful: {[tool['name'] for tool in tools]}")
-        else:
-            print(f"❌ Tools list failed: {mcp_response}")
+        if not connect_future.result():
+            print("❌ Failed to connect to SSE")
             return False
         
-        # Test 4: Call echo tool
-        print("\n📋 Test 4: Call echo tool")
-        call_message = {
-            "jsonrpc": "2.0",
-            "id": 3,
-            "method": "tools/call",
-            "params": {
-                "name": "echo",
-                "arguments": {
-                    "message": "Integration test message"
-                }
-            }
-        }
-        
-        print(f"→ Sending: {json.dumps(call_message, indent=2)}")
-        post_response = client.send_message(call_message)
-        print(f"📤 POST response: {post_response}")
-        
-        # Wait for MCP response via SSE
-        mcp_response = client.wait_for_response(request_id=3, timeout=5)
-        if mcp_response and mcp_response.get('result', {}).get('content'):
-            content = mcp_response['result']['content']
-            print(f"✓ Tool call successful: {content}")
-        else:
-            print(f"❌ Tool call failed: {mcp_response}")
-            return False
+        # Send the workflow in order, waiting on each reply via SSE before the next
+        responses = {}
+        post_response = None
+        for message, body in zip(
+            (INIT_MESSAGE, INITIALIZED_MESSAGE, TOOLS_MESSAGE, CALL_MESSAGE),
+            (INIT_BODY, INITIALIZED_BODY, TOOLS_BODY, CALL_BODY)
+        ):
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("→ Sending: %s", pretty_json(message))
+            sent = client.send_message(message, body)
+            logger.debug("📤 POST response: %s", sent)
+            if 'id' in message:
+                responses[message['id']] = client.wait_for_response(request_id=message['id'], timeout=5)
+            else:
+                post_response = sent
         
-        print("\n🎉 All tests passed!")
-        return True
+        return _report_results(
+            post_response,
+            responses[INIT_MESSAGE['id']],
+            responses[TOOLS_MESSAGE['id']],
+            responses[CALL_MESSAGE['id']]
+        )
         
     except Exception as e:
         print(f"❌ Test failed with exception: {e}")
@@ -264,53 +323,81 @@ def test_mcp_workflow(base_url=None):
     finally:
         client.disconnect()
 
+def _report_results(post_response, init_response, tools_response, call_response):
+    """Check and print the workflow's results in test order"""
+    print("\n📋 Test 1: Initialize")
+    if init_response and init_response.get('result', {}).get('protocolVersion'):
+        print("✓ Initialize successful")
+    else:
+        print(f"❌ Initialize failed: {init_response}")
+        return False
+    
+    # For notifications, we don't expect a response, just check if POST was successful
+    print("\n📋 Test 2: Initialized notification")
+    if post_response and post_response.get('status') == 'accepted':
+        print("✓ Initialized notification sent successfully")
+    else:
+        print(f"❌ Initialized notification failed: {post_response}")
+    
+    print("\n📋 Test 3: List tools")
+    if tools_response and tools_response.get('result', {}).get('tools'):
+        tools = tools_response['result']['tools']
+        print(f"✓ Tools list successful: {[tool['name'] for tool in tools]}")
+    else:
+        print(f"❌ Tools list failed: {tools_response}")
+        return False
+    
+    print("\n📋 Test 4: Call echo tool")
+    if call_response and call_response.get('result', {}).get('content'):
+        content = call_response['result']['content']
+        print(f"✓ Tool call successful: {content}")
+    else:
+        print(f"❌ Tool call failed: {call_response}")
+        return False
+    
+    print("\n🎉 All tests passed!")
+    return True
+
 def start_server(port=8080):
     """Start the MCP server for testing"""
     try:
-        # Build the server first
-        print("🔨 Building MCP server...")
-        build_result = subprocess.run(['make', 'build'], 
-                                    capture_output=True, text=True, timeout=30)
-        if build_result.returncode != 0:
-            print(f"❌ Build failed: {build_result.stderr}")
+        if not ensure_server_built():
             return None
         
-        print("✓ Build successful")
-        
         # Start the server
         print(f"🚀 Starting SSE server on port {port}...")
-        server_process = subprocess.Popen([
+        server_process = spawn_server([
             './mcp-server', 
             '-transport=sse', 
             f'-addr={port}',
             '-debug'
         ], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
         
-        # Wait for server to start
-        time.sleep(2)
-        
-        # Check if process is still alive
-        if server_process.poll() is not None:
-            stdout, stderr = server_process.communicate()
-            print(f"❌ Server process exited with code {server_process.returncode}")
-            print(f"STDOUT: {stdout.decode()}")
-            print(f"STDERR: {stderr.decode()}")
-            return None
-        
-        # Check if server is running
-        try:
-            health_response = requests.get(f"http://localhost:{port}/health", timeout=5)
-            if health_response.status_code == 200:
-                print(f"✓ Server started successfully on port {port}")
-                return server_process
-            else:
-                print(f"❌ Server health check failed")
-                server_process.terminate()
+        # Poll /health with exponential backoff until it answers, rather than a fixed 2s sleep
+        deadline = time.monotonic() + 3.0
+        delay = 0.005
+        while time.monotonic() < deadline:
+            # Check if process is still alive
+            if server_process.poll() is not None:
+                stdout, stderr = server_process.communicate()
+                print(f"❌ Server process exited with code {server_process.returncode}")
+                print(f"STDOUT: {stdout.decode()}")
+                print(f"STDERR: {stderr.decode()}")
                 return None
-        except Exception as e:
-            print(f"❌ Server not responding: {e}")
-            server_process.terminate()
-            return None
+            
+            try:
+                health_response = requests.get(f"http://127.0.0.1:{port}/health", timeout=0.2)
+                if health_response.status_code == 200:
+                    print(f"✓ Server started successfully on port {port}")
+                    return server_process
+            except requests.RequestException:
+                pass  # Not listening yet
+            time.sleep(delay)
+            delay = min(delay * 2, 0.2)
+        
+        print(f"❌ Server not responding on port {port}")
+        server_process.terminate()
+        return None
             
     except Exception as e:
         print(f"❌ Failed to start server: {e}")
@@ -323,11 +410,14 @@ def main():
     parser.add_argument("--port", type=int, default=8080, help="Port to run server on")
     parser.add_argument("--external-server", action="store_true", 
                        help="Use external server instead of starting our own")
+    parser.add_argument("--verbose", action="store_true",
+                       help="Log every message sent and received")
     
     args = parser.parse_args()
+    configure_logging(args.verbose)
     
     port = args.port
-    base_url = f"http://localhost:{port}"
+    base_url = f"http://127.0.0.1:{port}"  # Pinned to IPv4 so no request waits on a ::1 attempt first
     server_process = None
     
     print("🧪 Starting SSE Transport Integration Test")
@@ -4,107 +4,201 @@ STDIO Integration Test Script for MCP Server Framework
 This script tests the STDIO transport by launching the server process and communicating via stdin/stdout.
 """
 
-import json
+import collections
+import logging
+import selectors
 import subprocess
-import threading
 import time
 import sys
-import queue
 import os
 
+from _mcp_common import READY_MARKER, LineBuffer, configure_logging, dumps, ensure_server_built, loads, spawn_server
+
+# Full message traces cost a decode and a print per message; --verbose turns them on
+logger = logging.getLogger("mcp_test_client.stdio")
+
+# The workflow's messages never change, so they are built and encoded once at import
+INIT_MESSAGE = {
+    "jsonrpc": "2.0",
+    "id": 1,
+    "method": "initialize",
+    "params": {
+        "protocolVersion": "2024-11-05",
+        "capabilities": {},
+        "clientInfo": {
+            "name": "stdio-integration-test",
+            "version": "1.0.0"
+        }
+    }
+}
+
+INITIALIZED_MESSAGE = {
+    "jsonrpc": "2.0",
+    "method": "notifications/initialized"
+}
+
+TOOLS_MESSAGE = {
+    "jsonrpc": "2.0",
+    "id": 2,
+    "method": "tools/list"
+}
+
+CALL_MESSAGE = {
+    "jsonrpc": "2.0",
+    "id": 3,
+    "method": "tools/call",
+    "params": {
+        "name": "echo",
+        "arguments": {
+            "message": "STDIO integration test message"
+        }
+    }
+}
+
+_WORKFLOW_LINES = [dumps(message) + b'\n' for message in (INIT_MESSAGE, INITIALIZED_MESSAGE, TOOLS_MESSAGE, CALL_MESSAGE)]
+
+def _result(response):
+    """The response's result object, or None for a missing, failed or malformed response"""
+    result = response.get('result') if isinstance(response, dict) else None
+    return result if isinstance(result, dict) else None
+
 class STDIOClient:
     def __init__(self, command):
         self.command = command
         self.process = None
-        self.stdout_queue = queue.Queue()
-        self.stderr_queue = queue.Queue()
-        self.stdout_thread = None
-        self.stderr_thread = None
+        # Both pipes are read on the calling thread, under one selector, whenever a
+        # response is being waited for; complete stdout lines queue up in _stdout_lines
+        self._selector = None
+        self._line_buffers = {}
+        self._stdout_lines = collections.deque()
+        self.ready = False
         
     def start(self):
         """Start the STDIO server process"""
         try:
-            self.process = subprocess.Popen(
+            self.process = spawn_server(
                 self.command,
                 stdin=subprocess.PIPE,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
-                text=True,
-                bufsize=0  # Unbuffered
+                # Binary pipes: output is read straight off the descriptors by _pump() and
+                # requests go straight onto stdin's with os.writev(), so no TextIOWrapper
+                # or BufferedWriter sits in between
             )
             
-            # Start threads to read stdout and stderr
-            self.stdout_thread = threading.Thread(target=self._read_stdout)
-            self.stderr_thread = threading.Thread(target=self._read_stderr)
-            self.stdout_thread.daemon = True
-            self.stderr_thread.daemon = True
-            self.stdout_thread.start()
-            self.stderr_thread.start()
+            self._selector = selectors.DefaultSelector()
+            for name, pipe in (('stdout', self.process.stdout), ('stderr', self.process.stderr)):
+                self._selector.register(pipe.fileno(), selectors.EVENT_READ, name)
+                self._line_buffers[name] = LineBuffer()
             
             return True
         except Exception as e:
             print(f"Failed to start process: {e}")
             return False
     
-    def _read_stdout(self):
-        """Read stdout in a separate thread"""
-        try:
-            for line in iter(self.process.stdout.readline, ''):
-                if line.strip():
-                    self.stdout_queue.put(line.strip())
-        except Exception as e:
-            print(f"Error reading stdout: {e}")
+    def _pump(self, timeout):
+        """Wait up to timeout for output and take every complete line from the pipes that have some.
+        
+        The pipes are read 64 KiB at a time with os.read() on their descriptors rather
+        than readline(): lines already sitting in a file object's buffer wouldn't wake
+        the selector.
+        """
+        for key, _ in self._selector.select(timeout):
+            try:
+                chunk = os.read(key.fd, 65536)
+            except OSError as e:
+                print(f"Error reading {key.data}: {e}")
+                chunk = b''
+            if not chunk:
+                self._selector.unregister(key.fd)  # Server closed it
+                continue
+            
+            for line in self._line_buffers[key.data].feed(chunk):
+                if not line:
+                    continue  # Blank lines carry nothing on a pipe
+                if key.data == 'stdout':
+                    # Kept as bytes: loads() parses them directly, and they're only
+                    # decoded if they get printed
+                    self._stdout_lines.append(line)
+                else:
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug("🔍 Server log: %s", line.decode(errors='replace'))
+                    if not self.ready and READY_MARKER in line:
+                        self.ready = True
     
-    def _read_stderr(self):
-        """Read stderr in a separate thread"""
-        try:
-            for line in iter(self.process.stderr.readline, ''):
-                if line.strip():
-                    self.stderr_queue.put(line.strip())
-        except Exception as e:
-            print(f"Error reading stderr: {e}")
+    def wait_until_ready(self, timeout=2):
+        """Read server output until the startup log line appears; False if it doesn't within timeout"""
+        deadline = time.monotonic() + timeout
+        while not self.ready:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not self._selector.get_map():
+                return False
+            self._pump(remaining)
+        return True
     
-    def send_message(self, message):
-        """Send a JSON-RPC message to the server"""
+    def send_raw(self, lines):
+        """Write already-encoded, newline-terminated messages with a single writev()
+        
+        Gathering them in one syscall skips both joining them into one buffer and
+        copying them through stdin's buffer. A blocking pipe only takes less than
+        everything if a signal interrupts the write, in which case the rest goes
+        out with a plain write.
+        """
         try:
-            json_str = json.dumps(message)
-            print(f"→ Sending: {json_str}")
-            self.process.stdin.write(json_str + '\n')
-            self.process.stdin.flush()
+            if logger.isEnabledFor(logging.DEBUG):
+                for line in lines:
+                    logger.debug("→ Sending: %s", line[:-1].decode())
+            fd = self.process.stdin.fileno()
+            written = os.writev(fd, lines)
+            if written < sum(map(len, lines)):
+                remaining = b''.join(lines)[written:]
+                while remaining:
+                    remaining = remaining[os.write(fd, remaining):]
             return True
         except Exception as e:
-            print(f"Error sending message: {e}")
+            print(f"Error sending messages: {e}")
             return False
     
-    def wait_for_response(self, timeout=5):
-        """Wait for a response from the server"""
-        start_time = time.time()
-        
-        while time.time() - start_time < timeout:
-            try:
-                # Check for stdout (JSON responses)
-                response_line = self.stdout_queue.get(timeout=0.1)
+    def _next_response(self, deadline):
+        """Block until the next JSON line from stdout, or return None at deadline or EOF"""
+        while True:
+            while self._stdout_lines:
+                response_line = self._stdout_lines.popleft()
                 try:
-                    response = json.loads(response_line)
-                    print(f"← Received: {json.dumps(response, indent=2)}")
-                    return response
-                except json.JSONDecodeError:
-                    print(f"Non-JSON stdout: {response_line}")
+                    response = loads(response_line)
+                except ValueError:  # json's and orjson's JSONDecodeError both derive from it
+                    print(f"Non-JSON stdout: {response_line.decode(errors='replace')}")
                     continue
-            except queue.Empty:
-                # Check for stderr (debug/error messages)
-                try:
-                    stderr_line = self.stderr_queue.get_nowait()
-                    print(f"🔍 Server log: {stderr_line}")
-                except queue.Empty:
-                    pass
-                continue
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("← Received: %s", response_line.decode(errors='replace'))  # Already JSON; no need to re-serialize it
+                return response
+            
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not self._selector.get_map():
+                return None  # Out of time, or the server closed both pipes
+            self._pump(remaining)
+    
+    def collect_responses(self, request_ids, timeout=5):
+        """Wait for the responses to request_ids, in any order; returns {id: response} for those that arrived"""
+        pending = set(request_ids)
+        responses = {}
+        deadline = time.monotonic() + timeout
+        
+        while pending:
+            response = self._next_response(deadline)
+            if response is None:
+                print(f"⏰ Timeout waiting for responses to {sorted(pending)}")
+                break
+            if response.get('id') in pending:
+                pending.discard(response['id'])
+                responses[response['id']] = response
         
-        print(f"⏰ Timeout waiting for response")
-        return None
+        return responses
     
     def stop(self):
         """Stop the server process"""
+        if self._selector:
+            self._selector.close()
         if self.process:
             try:
                 self.process.terminate()
@@ -139,66 +233,38 @@ def test_mcp_workflow(server_binary=None):
             print("❌ Failed to start STDIO server")
             return False
         
-        # Give the server a moment to start
-        time.sleep(0.5)
-        
-        # Test 1: Initialize
-        print("\n📋 Test 1: Initialize")
-        init_message = {
-            "jsonrpc": "2.0",
-            "id": 1,
-            "method": "initialize",
-            "params": {
-                "protocolVersion": "2024-11-05",
-                "capabilities": {},
-                "clientInfo": {
-                    "name": "stdio-integration-test",
-                    "version": "1.0.0"
-                }
-            }
-        }
+        if not client.wait_until_ready(timeout=2):
+            print("⚠️ No startup log from the server, sending requests anyway")
         
-        if not client.send_message(init_message):
-            print("❌ Failed to send initialize message")
+        # Every request has its own id, so pipeline them all in one write and match
+        # the responses up afterwards instead of waiting out each round trip
+        print("\n📤 Sending all requests")
+        if not client.send_raw(_WORKFLOW_LINES):
+            print("❌ Failed to send requests")
             return False
+        responses = client.collect_responses([1, 2, 3], timeout=5)
         
-        response = client.wait_for_response(timeout=5)
-        if response and response.get('result', {}).get('protocolVersion'):
+        # Test 1: Initialize
+        print("\n📋 Test 1: Initialize")
+        response = responses.get(1)
+        result = _result(response)
+        if result and result.get('protocolVersion'):
             print("✓ Initialize successful")
         else:
             print(f"❌ Initialize failed: {response}")
             return False
         
         # Test 2: Initialized notification
+        # For notifications, we don't expect a JSON response; it went out with the rest
         print("\n📋 Test 2: Initialized notification")
-        initialized_message = {
-            "jsonrpc": "2.0",
-            "method": "notifications/initialized"
-        }
-        
-        if not client.send_message(initialized_message):
-            print("❌ Failed to send initialized notification")
-            return False
-        
-        # For notifications, we don't expect a JSON response, just check logs
-        time.sleep(0.5)
         print("✓ Initialized notification sent successfully")
         
         # Test 3: List tools
         print("\n📋 Test 3: List tools")
-        tools_message = {
-            "jsonrpc": "2.0",
-            "id": 2,
-            "method": "tools/list"
-        }
-        
-        if not client.send_message(tools_message):
-            print("❌ Failed to send tools/list message")
-            return False
-        
-        response = client.wait_for_response(timeout=5)
-        if response and response.get('result', {}).get('tools'):
-            tools = response['result']['tools']
+        response = responses.get(2)
+        result = _result(response)
+        tools = result.get('tools') if result else None
+        if tools:
             print(f"✓ Tools list successful: {[tool['name'] for tool in tools]}")
         else:
             print(f"❌ Tools list failed: {response}")
@@ -206,25 +272,10 @@ def test_mcp_workflow(server_binary=None):
         
         # Test 4: Call echo tool
         print("\n📋 Test 4: Call echo tool")
-        call_message = {
-            "jsonrpc": "2.0",
-            "id": 3,
-            "method": "tools/call",
-            "params": {
-                "name": "echo",
-                "arguments": {
-                    "message": "STDIO integration test message"
-                }
-            }
-        }
-        
-        if not client.send_message(call_message):
-            print("❌ Failed to send tools/call message")
-            return False
-        
-        response = client.wait_for_response(timeout=5)
-        if response and response.get('result', {}).get('content'):
-            content = response['result']['content']
+        response = responses.get(3)
+        result = _result(response)
+        content = result.get('content') if result else None
+        if content:
             print(f"✓ Tool call successful: {content}")
             
             # Verify the echo response
@@ -255,21 +306,18 @@ def main():
     parser = argparse.ArgumentParser(description="Test STDIO transport")
     parser.add_argument("--server-binary", default="./mcp-server", 
                        help="Path to the server binary")
+    parser.add_argument("--verbose", action="store_true",
+                       help="Log every message sent and received")
     
     args = parser.parse_args()
+    configure_logging(args.verbose)
     
     print("🧪 Starting STDIO Transport Integration Test")
     print(f"📡 Testing with binary: {args.server_binary}")
     
-    # Build the server first
-    print("🔨 Building MCP server...")
     try:
-        build_result = subprocess.run(['make', 'build'], 
-                                    capture_output=True, text=True, timeout=30)
-        if build_result.returncode != 0:
-            print(f"❌ Build failed: {build_result.stderr}")
+        if not ensure_server_built(args.server_binary):
             sys.exit(1)
-        print("✓ Build successful")
     except Exception as e:
         print(f"❌ Build failed: {e}")
         sys.exit(1)